@@ -0,0 +1,110 @@
+# A scheduled call of action(owner). Owners create their events once and
+# reschedule them as often as needed, so scheduling never allocates.
+class ScheduledEvent:
+    def __init__(self, owner, action):
+        self.owner = owner
+        self.action = action
+        self.due = 0
+        self.index = -1
+
+    def isScheduled(self):
+        return self.index >= 0
+
+# Runs timed game logic in SimClock time, checked once per clock step.
+# Pending events live in a binary heap ordered by due time; each event
+# knows its own heap index, so schedule and cancel are both O(log n).
+# Updates are timed under section, a FrameStats Section, when given.
+class AIScheduler:
+    def __init__(self, clock, section=None):
+        self.clock = clock
+        self.section = section
+        self.heap = []
+
+    def start(self):
+        self.clock.addListener(self.update)
+
+    def stop(self):
+        self.clock.removeListener(self.update)
+        for event in self.heap:
+            event.index = -1
+
+        del self.heap[:]
+
+    def schedule(self, event, delay):
+        event.due = self.clock.getTime() + delay
+        if event.isScheduled():
+            self.__siftUp(event.index)
+            self.__siftDown(event.index)
+            return
+
+        event.index = len(self.heap)
+        self.heap.append(event)
+        self.__siftUp(event.index)
+
+    def cancel(self, event):
+        if not event.isScheduled():
+            return
+
+        index = event.index
+        last = self.heap.pop()
+        event.index = -1
+        if last is event:
+            return
+
+        self.heap[index] = last
+        last.index = index
+        self.__siftUp(index)
+        self.__siftDown(last.index)
+
+    def update(self):
+        if self.section:
+            self.section.start()
+
+        now = self.clock.getTime()
+        heap = self.heap
+        while heap and heap[0].due <= now:
+            event = heap[0]
+            self.cancel(event)
+            event.action(event.owner)
+
+        if self.section:
+            self.section.stop()
+
+    def __siftUp(self, index):
+        heap = self.heap
+        event = heap[index]
+        while index > 0:
+            parentIndex = (index - 1) >> 1
+            parent = heap[parentIndex]
+            if parent.due <= event.due:
+                break
+
+            heap[index] = parent
+            parent.index = index
+            index = parentIndex
+
+        heap[index] = event
+        event.index = index
+
+    def __siftDown(self, index):
+        heap = self.heap
+        size = len(heap)
+        event = heap[index]
+        while True:
+            childIndex = 2 * index + 1
+            if childIndex >= size:
+                break
+
+            if childIndex + 1 < size and heap[childIndex + 1].due < heap[childIndex].due:
+                childIndex += 1
+
+            child = heap[childIndex]
+            if event.due <= child.due:
+                break
+
+            heap[index] = child
+            child.index = index
+            index = childIndex
+
+        heap[index] = event
+        event.index = index
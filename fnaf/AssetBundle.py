@@ -0,0 +1,56 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import *
+import glob, os, sys
+
+# Every asset in one Multifile, mounted over the game directory so the
+# usual relative data/ paths resolve inside it. The index is read once at
+# mount time and subfiles are stored uncompressed, so a load is a seek and
+# a read on the one open handle, served from the OS page cache that all
+# running instances share.
+#
+# Build it from the game directory after TextureBuilder:
+#     python fnaf/AssetBundle.py [bundle file]
+
+notify = directNotify.newCategory('AssetBundle')
+
+DefaultBundleFile = 'assets.mf'
+
+# Later directories win: processed models replace the raw ones.
+BundleSources = (('data', 'data'), ('build/data', 'data'))
+
+def mount(bundleFile):
+    multifile = Multifile()
+    if not multifile.openRead(Filename.fromOsSpecific(bundleFile)):
+        notify.warning("couldn't open %s, reading loose files" % bundleFile)
+        return False
+
+    root = Filename.fromOsSpecific(os.getcwd())
+    VirtualFileSystem.getGlobalPtr().mount(multifile, root, VirtualFileSystem.MFReadOnly)
+    notify.info('mounted %s: %d files' % (bundleFile, multifile.getNumSubfiles()))
+    return True
+
+def getBundleFiles():
+    files = {}
+    for directory, prefix in BundleSources:
+        for path in glob.glob(os.path.join(directory, '*')):
+            if os.path.isfile(path):
+                files['%s/%s' % (prefix, os.path.basename(path))] = path
+
+    return files
+
+def build(bundleFile):
+    if os.path.exists(bundleFile):
+        os.remove(bundleFile)
+
+    multifile = Multifile()
+    multifile.openWrite(Filename.fromOsSpecific(bundleFile))
+    files = getBundleFiles()
+    for name in sorted(files):
+        filename = Filename.binaryFilename(Filename.fromOsSpecific(files[name]))
+        multifile.addSubfile(name, filename, 0)
+
+    multifile.close()
+    print('Wrote %s: %d files' % (bundleFile, len(files)))
+
+if __name__ == '__main__':
+    build(sys.argv[1] if len(sys.argv) > 1 else DefaultBundleFile)
@@ -0,0 +1,85 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+# Runs a load plan: model files are all requested at once through the
+# loader's threaded API (loader-num-threads of them read in parallel) and
+# land in the ModelPool, so the later synchronous loads of the same files
+# are cache hits. Build steps run on the main thread as soon as the jobs
+# they depend on are done. Every file and step counts one unit of
+# progress.
+class AssetLoader:
+    notify = directNotify.newCategory('AssetLoader')
+
+    def __init__(self):
+        self.files = {}
+        self.steps = []
+        self.done = set()
+        self.pending = {}
+        self.total = 0
+        self.finished = 0
+        self.progressCallback = None
+        self.doneCallback = None
+
+    def addModels(self, name, modelFiles):
+        self.files[name] = list(modelFiles)
+        self.total += len(self.files[name])
+
+    def addStep(self, name, function, dependencies=()):
+        self.steps.append((name, function, tuple(dependencies)))
+        self.total += 1
+
+    def getProgress(self):
+        return self.finished / float(max(1, self.total))
+
+    def isDone(self):
+        return self.finished == self.total
+
+    def start(self, progressCallback=None, doneCallback=None):
+        self.progressCallback = progressCallback
+        self.doneCallback = doneCallback
+
+        for name, modelFiles in self.files.items():
+            self.pending[name] = len(modelFiles)
+            if not modelFiles:
+                self.__finishJob(name)
+                continue
+
+            for modelFile in modelFiles:
+                loader.loadModel(modelFile, callback=self.__gotModel, extraArgs=[name])
+
+        self.__runSteps()
+
+    def __gotModel(self, model, name):
+        if model is None:
+            self.notify.warning('%s: a model failed to load' % name)
+
+        self.__advance()
+        self.pending[name] -= 1
+        if not self.pending[name]:
+            self.__finishJob(name)
+            self.__runSteps()
+
+    def __finishJob(self, name):
+        self.done.add(name)
+
+    def __runSteps(self):
+        # Steps may depend on other steps, so keep going until none is ready.
+        ran = True
+        while ran:
+            ran = False
+            for step in self.steps[:]:
+                name, function, dependencies = step
+                if all(dependency in self.done for dependency in dependencies):
+                    self.steps.remove(step)
+                    function()
+                    self.done.add(name)
+                    self.__advance()
+                    ran = True
+
+    def __advance(self):
+        self.finished += 1
+        if self.progressCallback:
+            self.progressCallback(self.getProgress())
+
+        if self.isDone() and self.doneCallback:
+            callback, self.doneCallback = self.doneCallback, None
+            callback()
@@ -4,13 +4,15 @@ from direct.fsm.FSM import FSM
 from panda3d.core import *
 import random, math
 
-CameraPoints = (
-                ((66.6, -20.7, 7.2), (0, 0, 0), "Hallway"),
-                ((-112.694, -35.0187, 23.3818), (-3.71871, -19.9784, -0.604477), "Left Room"), 
-                ((-110, 95, 40), (0, -25.9784, -0.604477), "Control Room (Camera 1)"),
-                ((-130, 95, 40), (0, -25.9784, -0.604477), "Control Room (Camera 2)"),
-                ((65.0658, 195.454, 13.3796), (-3.71871, -19.9784, -0.604477), "Safe Room")
-)
+from CameraFeeds import CameraFeeds
+from FramePacer import MouseMoveEvent
+from HUD import StaticBatch
+from FrameStats import getSection
+import HUD
+from CogVisibility import OFFICE_VIEW, CAMERA_VIEWS
+import PVS
+from TextureBuilder import locateTexture
+from FactoryGlobals import CameraPoints, BrowserEnergyConsumption, OfficeCameraPos, OfficeLookRange, CameraOffset
 
 CameraButtonPos = {
     "Hallway": (.825, 0, .15),
@@ -26,16 +28,20 @@ class CameraBrowser(NodePath):
         self.reparentTo(render2d)
         
         self.controls = controls
+        self.feeds = None
         
         frameColor = (1, 1, 1, .95)
         
-        # Generate 4 frames around the display region
-        leftFrame = DirectFrame(frameSize=(-.98, -.96, -.98, .98), frameColor=frameColor, parent=self)
-        rightFrame = DirectFrame(frameSize=(.96, .98, -.98, .98), frameColor=frameColor, parent=self)
-        bottomFrame = DirectFrame(frameSize=(-.98, .98, -.98, -.96), frameColor=frameColor, parent=self)
-        topFrame = DirectFrame(frameSize=(-.98, .98, .98, .96), frameColor=frameColor, parent=self)
+        # Generate 4 frames around the display region, drawn as one geom
+        frames = StaticBatch("CameraBrowser-frames", self)
+        frames.addCard((-.98, -.96, -.98, .98), frameColor)
+        frames.addCard((.96, .98, -.98, .98), frameColor)
+        frames.addCard((-.98, .98, -.98, -.96), frameColor)
+        frames.addCard((-.98, .98, .96, .98), frameColor)
+        frames.setTransparency(1)
+        frames.flatten()
         
-        self.title = OnscreenText(parent=topFrame, pos=(-.6, .8), fg=(1, 1, 1, 1), text="",
+        self.title = OnscreenText(parent=self, pos=(-.6, .8), fg=(1, 1, 1, 1), text="",
                                   font=base.cogFont, scale=.16)
         
         self.titleCircle = OnscreenImage(image = 'data/titleCircle.png',parent=self.title,pos=(-.85, 0, .84),scale=.07)
@@ -49,7 +55,7 @@ class CameraBrowser(NodePath):
     def load(self):
         self.map = base.a2dBottomRight.attachNewNode(CardMaker("fnaf-map").generate())
         texture = "phase_9/maps/tt_fnaf_map.png" if base.withinTTH else "data/fnafmap.png"
-        self.map.setTexture(loader.loadTexture(texture))
+        self.map.setTexture(loader.loadTexture(locateTexture(texture)))
         self.map.setTransparency(1)
         self.map.setPos(self.map, (-1.25, 0, 0))
         self.map.setScale(1.15)
@@ -57,9 +63,23 @@ class CameraBrowser(NodePath):
         self.map.stash()
         
         self.cameras = []
+        self.cameraEvents = []
         for index, (pos, hpr, name) in enumerate(CameraPoints):
             self.createCamera(index, pos, hpr, name)
             
+        # Each camera renders to a texture shown on a full screen card
+        # behind the frames; without offscreen buffers base.camera hops
+        # between the camera nodes instead.
+        self.feeds = CameraFeeds()
+        if self.feeds.load([camNP for name, button, camNP in self.cameras]):
+            cm = CardMaker("fnaf-camera-feed")
+            cm.setFrameFullscreenQuad()
+            self.feedCard = self.attachNewNode(cm.generate())
+            self.feedCard.setBin('background', 0)
+            
+        else:
+            self.feeds = None
+            
         self.__cameraIndex = 0
         
     def setCamera(self, index):
@@ -67,20 +87,36 @@ class CameraBrowser(NodePath):
         self.__cameraIndex = index
         self.enableCurrentCamera()
         
+    def getCameraIndex(self):
+        return self.__cameraIndex
+        
     def disableCurrentCamera(self):
         name, button, camNP = self.cameras[self.__cameraIndex]
-        base.camera.reparentTo(render)
-        base.camera.setPos(render, 0, 0, 0)
+        if not self.feeds:
+            base.camera.reparentTo(render)
+            base.camera.setPos(render, 0, 0, 0)
+            PVS.setCameraView(base.camNode, OFFICE_VIEW)
+            
+        base.level.setActiveView(OFFICE_VIEW)
         button['state'] = DGG.NORMAL
         
     def enableCurrentCamera(self):
         name, button, camNP = self.cameras[self.__cameraIndex]
-        base.camera.reparentTo(camNP)
-        base.camera.setPos(camNP, 0, 30, -10)
-        cleanName = name.replace(' ', '')
-        cleanName = cleanName.replace('(', '')
-        cleanName = cleanName.replace(')', '')
-        messenger.send("cameraSeeing%s" % cleanName)
+        if self.feeds:
+            # The other feeds still refresh now and then, so keep every
+            # camera's cogs animated while the browser is open.
+            self.feeds.select(self.__cameraIndex)
+            self.feedCard.setTexture(self.feeds.getTexture(self.__cameraIndex), 1)
+            base.level.setActiveViews(CAMERA_VIEWS)
+            
+        else:
+            base.camera.reparentTo(camNP)
+            base.camera.setPos(camNP, *CameraOffset)
+            PVS.setCameraView(base.camNode, self.__cameraIndex)
+            base.level.setActiveView(self.__cameraIndex)
+            
+        base.level.handleCameraSeeing(self.__cameraIndex)
+        messenger.send(self.cameraEvents[self.__cameraIndex])
         
         button['state'] = DGG.DISABLED
                     
@@ -88,13 +124,12 @@ class CameraBrowser(NodePath):
         camNP = render.attachNewNode(Camera('cam'))
         camNP.setPos(pos)
         camNP.setHpr(hpr)
-        cleanName = name.replace(' ', '')
-        cleanName = cleanName.replace('(', '')
-        cleanName = cleanName.replace(')', '')
+        cleanName = self.cleanCameraName(name)
+        self.cameraEvents.append("cameraSeeing%s" % cleanName)
         
         pos = CameraButtonPos.get(cleanName)
-        button = DirectFrame(parent=self.map,
-                             frameColor=(1, 1, 1, 0),
+        # Only a click region, nothing to draw.
+        button = DirectFrame(parent=self.map, relief=None,
                              frameSize=(-.16, .29, -.15, .15),
                              pos=pos, scale=.2,
                              state=DGG.NORMAL)
@@ -103,11 +138,18 @@ class CameraBrowser(NodePath):
         
         self.cameras.append((name, button, camNP))
         
+    @staticmethod
+    def cleanCameraName(name):
+        return name.replace(' ', '').replace('(', '').replace(')', '')
+        
     def blinkCircle(self, task):
-        time = int(task.time)
-        method = (self.titleCircle.hide, self.titleCircle.show)[time % 2]
-        method()
-        return task.cont
+        if self.titleCircle.isHidden():
+            self.titleCircle.show()
+            
+        else:
+            self.titleCircle.hide()
+            
+        return task.again
         
     def show(self):
         NodePath.show(self)
@@ -115,6 +157,11 @@ class CameraBrowser(NodePath):
         self.map.unstash()
         self.titleCircle.show()
         taskMgr.doMethodLater(1, self.blinkCircle, 'fnaf-camera-blinkCircle')
+        if self.feeds:
+            # The feed card covers the whole window, don't draw the office.
+            base.camNode.setActive(False)
+            self.feeds.start()
+            
         self.enableCurrentCamera()
         
     def hide(self):
@@ -123,14 +170,16 @@ class CameraBrowser(NodePath):
         if hasattr(self, 'map'):
             self.map.stash()
             self.disableCurrentCamera()
+            if self.feeds:
+                self.feeds.stop()
+                base.camNode.setActive(True)
+                
         taskMgr.remove('fnaf-camera-blinkCircle')
 
 class CameraControls(FSM):
     def __init__(self):
         FSM.__init__(self, "CameraControls")
-        self.taskName = "CameraControls-task"
-        self.browser = CameraBrowser(self)
-        self.browser.hide()
+        self.browser = None
         self.browserButton = DirectButton(text="Cameras", text_fg=(1, 1, 1, 1), scale=.07,
                                           pos=(0, 0, -.9), text_bg=(0, 0, 0, .75),
                                           text_font=base.cogFont, command=self.request,
@@ -147,45 +196,71 @@ class CameraControls(FSM):
         if base.withinTTH:
             self.leaveGameButton.destroy()
        
-    def enter(self):
+    def enter(self, cameraIndex=0):
         self.demand('Flashlight')
         
         # Reset the camera index
-        self.browser.setCamera(0)
-        self.browser.disableCurrentCamera()
+        browser = self.getBrowser()
+        browser.setCamera(cameraIndex)
+        browser.disableCurrentCamera()
         
     def exit(self):
         self.demand('Off')
+        
+    def getBrowser(self):
+        # Built on first use, the menu doesn't need it.
+        if self.browser is None:
+            self.browser = CameraBrowser(self)
+            self.browser.hide()
+            self.browser.load()
+            
+        return self.browser
 
     def enterFlashlight(self):
-        taskMgr.add(self.updateTask, self.taskName)
-        base.cam.setPos(0, -27, 5)
+        base.cam.setPos(*OfficeCameraPos)
         base.cam.setH(0)
+        x, y = base.framePacer.getMouse()
+        if x is not None:
+            self.look(x, y)
+            
+        self.accept(MouseMoveEvent, self.look)
+        HUD.reportDrawCalls('office')
+        PVS.setCameraView(base.camNode, OFFICE_VIEW)
+        base.level.setActiveView(OFFICE_VIEW)
         self.browserButton.show()
         
     def exitFlashlight(self): 
-        taskMgr.remove(self.taskName)
+        self.ignore(MouseMoveEvent)
         self.browserButton.hide()
         
     def enterBrowser(self):
-        base.timer.addEnergyConsumption('cameraBrowser', 2)
+        base.timer.addEnergyConsumption('cameraBrowser', BrowserEnergyConsumption)
         self.browser.show()
+        HUD.reportDrawCalls('browser')
         
     def exitBrowser(self):
         base.timer.removeEnergyConsumption('cameraBrowser')
         self.browser.hide()
         
-    def updateTask(self, task):
-        m = base.mouseWatcherNode
-        if m.hasMouse():
-            x = m.getMouseX()
-            
-            offset = 45
-            
-            h = min((x + 1) * offset, 2 * offset)
-            h = max(h, -offset)
-            h = offset - h
+    def look(self, x, y):
+        # Only called when the pointer moves, see FramePacer.
+        section = getSection('look')
+        section.start()
+        offset = OfficeLookRange
+        
+        h = min((x + 1) * offset, 2 * offset)
+        h = max(h, -offset)
+        h = offset - h
 
-            base.cam.setH(h)
+        base.cam.setH(h)
+        section.stop()
+        
+    def isViewChanging(self):
+        # A cog in sight keeps animating.
+        if self.state == 'Flashlight':
+            return base.level.isViewChanging(OFFICE_VIEW)
+            
+        if self.state == 'Browser':
+            return base.level.isViewChanging(self.browser.getCameraIndex())
             
-        return task.cont
+        return False
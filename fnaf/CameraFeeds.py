@@ -0,0 +1,123 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import *
+
+from FactoryGlobals import CameraFov, CameraNear, CameraOffset, OfficeCameraPos, FogFarDistance
+import PVS
+
+class CameraFeed:
+    def __init__(self, index, buffer, parent):
+        self.index = index
+        self.viewBit = 1 << index
+        self.buffer = buffer
+        self.texture = buffer.getTexture()
+        self.lastRefresh = None
+
+        buffer.setClearColor((0, 0, 0, 1))
+        buffer.setActive(False)
+
+        lens = PerspectiveLens()
+        lens.setFov(CameraFov)
+        lens.setNear(CameraNear)
+        lens.setFar(FogFarDistance)
+        lens.setAspectRatio(base.getAspectRatio())
+
+        # Same eye as base.cam had when base.camera sat on the camera node.
+        self.camNP = base.makeCamera(buffer, lens=lens, camName='cctv-cam-%d' % index,
+                                     mask=PVS.getDrawMask(self.viewBit))
+        self.camNP.reparentTo(parent)
+        self.camNP.setPos(*[a + b for a, b in zip(OfficeCameraPos, CameraOffset)])
+
+    def refresh(self, now):
+        # Render one frame, then the buffer switches itself off again and
+        # the texture keeps the image. A one-shot doesn't wake up a buffer
+        # that was switched off, so switch it on too.
+        self.lastRefresh = now
+        self.buffer.setActive(True)
+        self.buffer.setOneShot(True)
+
+    def destroy(self):
+        base.graphicsEngine.removeWindow(self.buffer)
+        if self.camNP in base.camList:
+            base.camList.remove(self.camNP)
+
+        self.camNP.removeNode()
+
+# Every CCTV camera renders into its own offscreen texture. The feed on
+# screen redraws every frame; the rest only redraw every idleInterval
+# seconds, or every motionInterval while a cog walks through their view.
+# Switching cameras just swaps the texture the browser shows.
+class CameraFeeds:
+    notify = directNotify.newCategory('CameraFeeds')
+    taskName = 'CameraFeeds-task'
+
+    def __init__(self):
+        self.size = config.GetInt('fnaf-cctv-size', 512)
+        self.idleInterval = 1.0 / config.GetDouble('fnaf-cctv-idle-rate', 1)
+        self.motionInterval = 1.0 / config.GetDouble('fnaf-cctv-motion-rate', 8)
+
+        self.feeds = []
+        self.selected = None
+        self.running = False
+
+    def load(self, parents):
+        # Returns False when the window can't give us offscreen buffers.
+        for index, parent in enumerate(parents):
+            buffer = base.win.makeTextureBuffer('cctv-%d' % index, self.size, self.size)
+            if not buffer:
+                self.notify.warning('no offscreen buffer for camera %d, rendering cameras directly' % index)
+                self.unload()
+                return False
+
+            self.feeds.append(CameraFeed(index, buffer, parent))
+
+        return True
+
+    def unload(self):
+        self.stop()
+        for feed in self.feeds:
+            feed.destroy()
+
+        self.feeds = []
+
+    def getTexture(self, index):
+        return self.feeds[index].texture
+
+    def select(self, index):
+        if self.selected is not None:
+            self.selected.buffer.setActive(False)
+
+        self.selected = self.feeds[index]
+        if self.running:
+            self.selected.buffer.setOneShot(False)
+            self.selected.buffer.setActive(True)
+
+    def start(self):
+        self.running = True
+        now = globalClock.getFrameTime()
+        for feed in self.feeds:
+            feed.refresh(now)
+
+        if self.selected:
+            self.select(self.selected.index)
+
+        taskMgr.add(self.__update, self.taskName)
+
+    def stop(self):
+        self.running = False
+        taskMgr.remove(self.taskName)
+        for feed in self.feeds:
+            feed.buffer.setOneShot(False)
+            feed.buffer.setActive(False)
+
+    def __update(self, task):
+        now = globalClock.getFrameTime()
+        movingViews = base.level.getMovingViews()
+        for feed in self.feeds:
+            if feed is self.selected:
+                continue
+
+            interval = self.motionInterval if movingViews & feed.viewBit else self.idleInterval
+            if now - feed.lastRefresh >= interval:
+                feed.refresh(now)
+
+        return task.cont
@@ -1,95 +1,35 @@
 from direct.interval.IntervalGlobal import *
 from direct.actor.Actor import Actor
+from direct.directnotify.DirectNotifyGlobal import directNotify
 from panda3d.core import *
 
 from Timer import Timer
+from CogGraph import RIGHT_DOOR, LEFT_DOOR, PointMap, graph
+from FactoryGlobals import CogBehaviours, CogSpeeds, CogStartPoints, CogStartHeadings, CogWatchCameras
+from AIScheduler import ScheduledEvent
+from CogVisibility import getVisibility, ALL_VIEWS
 import random
 
-RIGHT_DOOR = 0
-LEFT_DOOR = 1
-
-PointMap = {
-1: (Vec3(0, 0, 0), None),
-2: (Vec3(-50, 0, 0), {1: LEFT_DOOR}),
-3: (Vec3(-100, 30, 0), None),
-4: (Vec3(-100, -30, 0), None),
-5: (Vec3(-100, 0, 0), None),
-6: (Vec3(-150, 0, 0), None),
-7: (Vec3(-172, 25, 0), None),
-8: (Vec3(-172, 45, 10), None),
-9: (Vec3(-165, 50, 10), None),
-10: (Vec3(-150, 55, 10), None),
-11: (Vec3(-100, 60, 10), None),
-12: (Vec3(-80, 65, 10), None),
-13: (Vec3(-110, 90, 10), None),
-14: (Vec3(-140, 170, 10), None),
-15: (Vec3(-100, 150, 10), None),
-16: (Vec3(70, 0, 0), None),
-17: (Vec3(49, 0, 0), {1: RIGHT_DOOR}),
-18: (Vec3(72, 247, 0), None),
-19: (Vec3(71, 100, 0), None)
-}
-
-Connections = {
-1: [],
-2: [1, 3, 4, 5],
-3: [4, 5, 2, 6],
-4: [5, 2, 6],
-5: [2, 3, 4, 6],
-6: [5, 4, 3],
-7: [6, 4], # Add 8 to allow cogs to go stairs up.
-8: [7, 9],
-9: [8, 10],
-10: [9, 11, 12],
-11: [9, 12, 13],
-12: [13, 9],
-13: [12],
-14: [13],
-15: [13],
-16: [17, 18],
-17: [1, 16],
-18: [19],
-19: [16, 18]
-}
-
 class CogPoint:
-    def __init__(self, pointIndex, prevIndex=0):
+    def __init__(self, pointIndex):
         self.pointIndex = pointIndex
-        self.prevIndex = None
-        self.pointDesc = PointMap[self.pointIndex]
+        self.pos = Vec3(*graph.positions[self.pointIndex])
         
     def getPos(self):
-        return self.pointDesc[0]
+        return self.pos
         
     def getNextPoint(self):
-        possiblePoints = []
-        for point in Connections[self.pointIndex]:
-            doorCondition = self.pointDesc[1]
+        index = graph.getNextPoint(self.pointIndex, base.level.doorState,
+                                   base.level.occupancy, base.level.pointCapacity)
+        if index is None:
+            return None
             
-            if doorCondition is None:
-                possiblePoints.append(point)
-                continue
-                
-            doorIndex = doorCondition.get(point, None)
-            if doorIndex is None:
-                possiblePoints.append(point)
-                continue
-                
-            # Trying to reach a point that depends on a door being open.
-            # If it's open, go ahead. Else, ignore this point.
-            if base.level.dynamicDoors[doorIndex].isOpen():
-                return self.__class__(point, self.pointIndex)
-                
-        if len(possiblePoints) > 1 and self.prevIndex in possiblePoints:
-            possiblePoints.remove(self.prevIndex)
-                
-        random.shuffle(possiblePoints)
-
-        return self.__class__(possiblePoints[0], self.pointIndex)
+        return CogPoints[index]
         
     def reached(self, cog):
         if self.pointIndex == 1:
-            # Game over
+            # Game over; the night stops while the dance plays in real time.
+            base.simClock.pause()
             base.level.stopAllCogs()
             base.camControls.demand('Flashlight')
             base.camControls.demand('Off')
@@ -98,106 +38,100 @@ class CogPoint:
             return
             
         delay = random.random() * 2.5
-        taskMgr.doMethodLater(delay, lambda: cog.walkToPoint(self.getNextPoint()), cog.taskName('nextPoint'), extraArgs=[])
+        base.level.scheduler.schedule(cog.nextPointEvent, delay)
         
     @classmethod
     def fromTypeStart(cls, type):
-        if type == "A": return cls(14)
-        elif type == "B": return cls(18)
-        elif type == "C": return cls(15)
-
-CogBehaviours = {
-'A': {
-      1: {
-          'awake': 3,
-          'walkDelay': .35,
-         },
-      2: {
-          'awake': 2,
-          'walkDelay': .1,
-         },
-      3: {
-          'awake': 1,
-          'walkDelay': 0,
-         },
-      4: {
-          'awake': 0,
-          'walkDelay': 0,
-         },
-      5: {
-          'awake': 0,
-          'walkDelay': 0,
-         }
-    },
-'B': {
-      1: {
-          'awake': 'onCamera-0',
-          'walkDelay': 0,
-         },
-      2: {
-          'awake': 'onCamera-3',
-          'walkDelay': .3,
-         },
-      3: {
-          'awake': 'onCamera-2',
-          'walkDelay': .15,
-         },
-      4: {
-          'awake': 'onCamera-1',
-          'walkDelay': 0,
-         },
-      5: {
-          'awake': 'onCamera-1',
-          'walkDelay': 0,
-         }
-    },
-'C': {
-      1: {
-          'awake': 0,
-          'walkDelay': 0,
-         },
-      2: {
-          'awake': 'onCamera-0',
-          'walkDelay': 0,
-         },
-      3: {
-          'awake': 'onCamera-0',
-          'walkDelay': .05,
-         },
-      4: {
-          'awake': 'onCamera-3',
-          'walkDelay': 0,
-         },
-      5: {
-          'awake': 'onCamera-2',
-          'walkDelay': 0,
-         }
-    }
-}
+        return CogPoints[CogStartPoints[type]]
+        
+# One shared CogPoint per node, so walking never allocates points.
+CogPoints = dict((index, CogPoint(index)) for index in PointMap)
 
 class Cog(Actor):
-    anims = ("victory", "walk", "neutral")
-    speedMap = {'A': 10, 'B': 15, 'C': 12}
+    notify = directNotify.newCategory('Cog')
     
-    def __init__(self, type):
-        model = self.locateModelFile(type)
-        animMap = {}
-        
-        for anim in Cog.anims:
-            animMap[anim] = self.locateAnimFile(anim, type)
-            
-        Actor.__init__(self, model, animMap)
+    anims = ("walk", "neutral")
+    lazyAnims = ("victory",)
+    speedMap = CogSpeeds
+    prototypes = {}
+    
+    def __init__(self, type, startPoint=None):
+        # Copy the suit's prototype, sharing its geometry and anim bundles.
+        Actor.__init__(self, other=self.getPrototype(type))
         self.type = type
+        self.startPoint = CogPoints[startPoint or CogStartPoints[type]]
+        self.moverIndex = None
+        
+        # Views that could show this cog where it stands or walks now.
+        self.viewMask = ALL_VIEWS
+        self.culled = False
+        self.currentAnim = None
         self.walkPath = None
         self.speed = Cog.speedMap[self.type]
         
-    def locateModelFile(self, type):
+        self.walkPathName = 'Cog-walkPath-%d' % id(self)
+        self.danceName = 'Cog-dance-%d' % id(self)
+        
+        self.startWalkingEvent = ScheduledEvent(self, Cog.startWalking)
+        self.nextPointEvent = ScheduledEvent(self, Cog.walkToNextPoint)
+        self.arriveEvent = ScheduledEvent(self, Cog.arrive)
+        
+    @classmethod
+    def getPrototype(cls, type):
+        prototype = cls.prototypes.get(type)
+        if prototype is None:
+            animMap = {}
+            for anim in cls.anims:
+                animMap[anim] = cls.locateAnimFile(anim, type)
+                
+            prototype = Actor(cls.locateModelFile(type), animMap)
+            prototype.bindAnim(list(cls.anims))
+            cls.prototypes[type] = prototype
+            
+        return prototype
+        
+    @classmethod
+    def clearPrototypes(cls):
+        for prototype in cls.prototypes.values():
+            prototype.cleanup()
+            prototype.removeNode()
+            
+        cls.prototypes = {}
+        
+    def bindLazyAnim(self, animName):
+        if animName not in self.getAnimNames():
+            self.loadAnims({animName: self.locateAnimFile(animName, self.type)})
+            
+        self.bindAnim(animName)
+        
+    def getMemoryUsage(self):
+        # Vertex arrays referenced by several geoms (other cogs of the same
+        # suit) are split evenly between them.
+        total = 0
+        owned = 0
+        for geomNode in self.findAllMatches('**/+GeomNode'):
+            node = geomNode.node()
+            for i in xrange(node.getNumGeoms()):
+                vdata = node.getGeom(i).getVertexData()
+                for j in xrange(vdata.getNumArrays()):
+                    array = vdata.getArray(j)
+                    size = array.getDataSizeBytes()
+                    total += size
+                    
+                    # Our own wrapper holds one of the references.
+                    owned += size / max(1, array.getRefCount() - 1)
+                    
+        return {'vertexBytes': total, 'ownedVertexBytes': owned, 'anims': self.getAnimNames()}
+        
+    @classmethod
+    def locateModelFile(cls, type):
         if not base.withinTTH:
             return "data/suit%s.bam" % type
             
         return "phase_5/models/char/cog%s_robot-zero" % type
         
-    def locateAnimFile(self, animName, type):
+    @classmethod
+    def locateAnimFile(cls, animName, type):
         if not base.withinTTH:
             return "data/suit%s-%s.bam" % (type, animName)
             
@@ -208,74 +142,147 @@ class Cog(Actor):
                 
         return "phase_%s/models/char/suit%s-%s" % (phase, type, animName)
         
-    def initialiseAIBehaviours(self, night, quadrant=None):
+    def initialiseAIBehaviours(self, night):
+        # Level indexes the cog under awakeHour and awakeCamera (a
+        # CameraPoints index, or None) and calls wakeUp when either fires.
         self.awake = False
+        self.awakeCamera = None
         
         self.behaviours = CogBehaviours[self.type][night]
         awakeTime = self.behaviours['awake']
         if isinstance(awakeTime, str):
             _, awakeTime = awakeTime.split('-')
             awakeTime = int(awakeTime)
-            self.acceptOnce("cameraSeeing%s" % quadrant, self.__doAwake)
+            self.awakeCamera = CogWatchCameras[self.type]
             
-        self.__awakeTime = awakeTime
-            
-        self.accept("enterHour", self.__doAwake)
+        self.awakeHour = awakeTime
         
-    def __doAwake(self, hour=None):
-        if hour is not None:
-            if hour != self.__awakeTime:
-                return
-                
+    def wakeUp(self):
+        if self.awake:
+            return
+            
         self.awake = True
         delay = self.behaviours['walkDelay'] * Timer.secondsPerHour
-        taskMgr.doMethodLater(delay, self.__startWalking, self.taskName('startWalking'))
+        base.level.scheduler.schedule(self.startWalkingEvent, delay)
         
-    def __startWalking(self, task=None):
-        self.point = CogPoint.fromTypeStart(self.type)
-        self.walkToPoint(self.point.getNextPoint())
+    def startWalking(self):
+        self.point = self.startPoint
+        self.walkToNextPoint()
         
-        if task:
-            return task.done
+    def walkToNextPoint(self):
+        point = self.point.getNextPoint()
+        if point is None:
+            # Every way out is taken, try again in a bit.
+            base.level.scheduler.schedule(self.nextPointEvent, random.random() * 2.5)
+            return
             
+        self.walkToPoint(point)
+        
     def walkToPoint(self, point):
-        def complete():
-            self.loop('neutral')
-            self.setP(0)
-            self.setR(0)
-            point.reached(self)
+        edge = graph.getEdge(self.point.pointIndex, point.pointIndex)
+        time = graph.edgeLengths[edge] / self.speed
+        
+        self.setAnim('walk')
+        self.setHpr(graph.edgeHprs[edge])
+        self.setViewMask(getVisibility().edgeViews[edge])
+        
+        occupancy = base.level.occupancy
+        occupancy[self.point.pointIndex] -= 1
+        occupancy[point.pointIndex] += 1
+        
+        # Arriving is a logic event in sim time; the mover or the walk
+        # interval only show the cog on its way.
+        base.level.scheduler.schedule(self.arriveEvent, time)
+        
+        mover = base.level.mover
+        if mover:
+            mover.move(self, graph.positions[self.point.pointIndex], graph.positions[point.pointIndex], time)
+            self.point = point
+            return
             
-        here = self.getPos()
-        target = point.getPos()
+        # The pooled walk lasts one second; playRate stretches it to the edge.
+        self.walkPath = base.intervalPool.get(self.walkPathName, self.__makeWalkPath)
+        self.walkPath.setStartPos(self.point.getPos())
+        self.walkPath.setEndPos(point.getPos())
+        self.point = point
+        self.walkPath.start(playRate=base.simClock.timeScale / time)
         
-        dist = (here - target).length()
-        time = dist / self.speed
+    def __makeWalkPath(self):
+        return self.posInterval(1, self.point.getPos(), self.point.getPos())
         
-        self.loop('walk')
-        self.lookAt(Point3(target))
-        self.walkPath = Sequence(self.posInterval(time, target, here), Func(complete))
-        self.walkPath.start()
+    def arrive(self):
+        if self.walkPath:
+            self.walkPath.pause()
+            self.walkPath = None
+            
+        if self.moverIndex is not None and base.level.mover:
+            base.level.mover.stopCog(self)
+            
+        self.setPos(self.point.getPos())
+        self.walkComplete()
+        
+    def walkComplete(self):
+        self.setAnim('neutral')
+        self.setViewMask(getVisibility().pointViews[self.point.pointIndex])
+        self.setP(0)
+        self.setR(0)
+        self.point.reached(self)
         
     def stopAIBehaviours(self):
         self.awake = False
-        self.ignoreAll()
-        self.loop('neutral')
-        taskMgr.remove(self.taskName("startWalking"))
-        taskMgr.remove(self.taskName("nextPoint"))
+        self.setAnim('neutral')
+        base.level.scheduler.cancel(self.startWalkingEvent)
+        base.level.scheduler.cancel(self.nextPointEvent)
+        base.level.scheduler.cancel(self.arriveEvent)
         if self.walkPath:
             self.walkPath.pause()
             self.walkPath = None
             
+        if self.moverIndex is not None and base.level.mover:
+            base.level.mover.stopCog(self)
+            
     def danceAndGameOver(self):
-        Sequence(ActorInterval(self, 'victory'), EventInterval('gameFailed')).start()
+        self.setViewMask(ALL_VIEWS)
+        base.intervalPool.get(self.danceName, self.__makeDance).start()
         
-    def taskName(self, string):
-        return "Cog-%s-%d" % (string, id(self))
+    def __makeDance(self):
+        self.bindLazyAnim('victory')
+        return Sequence(ActorInterval(self, 'victory'), EventInterval('gameFailed'))
         
+    def setAnim(self, anim):
+        self.currentAnim = anim
+        if not self.culled:
+            self.loop(anim)
+            
+    def setViewMask(self, viewMask):
+        self.viewMask = viewMask
+        self.updateCulling(base.level.activeViews)
+        
+    def updateCulling(self, views):
+        # Nobody can see us: stop evaluating the animation and keep the
+        # character out of the cull traversal so its joints aren't updated.
+        culled = not (self.viewMask & views)
+        if culled == self.culled:
+            return
+            
+        self.culled = culled
+        if culled:
+            self.stop()
+            self.hide()
+            
+        else:
+            self.show()
+            if self.currentAnim:
+                self.loop(self.currentAnim)
+                
     def resetPos(self):
-        self.setPos(CogPoint.fromTypeStart(self.type).getPos())
+        self.point = self.startPoint
+        self.setViewMask(getVisibility().pointViews[self.point.pointIndex])
+        self.setPos(self.startPoint.getPos())
+        self.setHpr(CogStartHeadings[self.type], 0, 0)
         
-        if self.type == "A": self.setH(220)
-        elif self.type == "B": self.setH(40)
-        elif self.type == "C": self.setH(155)
+    def restore(self, transform):
+        self.point = self.startPoint
+        self.setTransform(transform)
+        self.setViewMask(getVisibility().pointViews[self.point.pointIndex])
         
\ No newline at end of file
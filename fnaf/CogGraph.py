@@ -0,0 +1,128 @@
+import random, math
+
+RIGHT_DOOR = 0
+LEFT_DOOR = 1
+
+PointMap = {
+1: ((0, 0, 0), None),
+2: ((-50, 0, 0), {1: LEFT_DOOR}),
+3: ((-100, 30, 0), None),
+4: ((-100, -30, 0), None),
+5: ((-100, 0, 0), None),
+6: ((-150, 0, 0), None),
+7: ((-172, 25, 0), None),
+8: ((-172, 45, 10), None),
+9: ((-165, 50, 10), None),
+10: ((-150, 55, 10), None),
+11: ((-100, 60, 10), None),
+12: ((-80, 65, 10), None),
+13: ((-110, 90, 10), None),
+14: ((-140, 170, 10), None),
+15: ((-100, 150, 10), None),
+16: ((70, 0, 0), None),
+17: ((49, 0, 0), {1: RIGHT_DOOR}),
+18: ((72, 247, 0), None),
+19: ((71, 100, 0), None)
+}
+
+Connections = {
+1: [],
+2: [1, 3, 4, 5],
+3: [4, 5, 2, 6],
+4: [5, 2, 6],
+5: [2, 3, 4, 6],
+6: [5, 4, 3],
+7: [6, 4], # Add 8 to allow cogs to go stairs up.
+8: [7, 9],
+9: [8, 10],
+10: [9, 11, 12],
+11: [9, 12, 13],
+12: [13, 9],
+13: [12],
+14: [13],
+15: [13],
+16: [17, 18],
+17: [1, 16],
+18: [19],
+19: [16, 18]
+}
+
+# Precompiled, read-only form of PointMap and Connections. Node ids are the
+# PointMap indices and edges are addressed by src * size + dst. Door gated
+# edges carry a (1 << doorIndex) bit tested against Level.doorState.
+class CogGraph:
+    def __init__(self, pointMap, connections):
+        size = max(pointMap) + 1
+
+        positions = [None] * size
+        for index, (pos, _) in pointMap.items():
+            positions[index] = tuple(float(x) for x in pos)
+
+        neighbours = [()] * size
+        gatedEdges = [()] * size
+        edgeLengths = [0.0] * (size * size)
+        edgeHprs = [None] * (size * size)
+
+        for index, targets in connections.items():
+            doorCondition = pointMap[index][1] or {}
+            free = []
+            gated = []
+
+            for target in targets:
+                edge = index * size + target
+                edgeLengths[edge], edgeHprs[edge] = self.__measure(positions[index], positions[target])
+
+                doorIndex = doorCondition.get(target, None)
+                if doorIndex is None:
+                    free.append(target)
+
+                else:
+                    gated.append((1 << doorIndex, target))
+
+            neighbours[index] = tuple(free)
+            gatedEdges[index] = tuple(gated)
+
+        self.size = size
+        self.positions = tuple(positions)
+        self.neighbours = tuple(neighbours)
+        self.gatedEdges = tuple(gatedEdges)
+        self.edgeLengths = tuple(edgeLengths)
+        self.edgeHprs = tuple(edgeHprs)
+
+    def __measure(self, src, dst):
+        dx = dst[0] - src[0]
+        dy = dst[1] - src[1]
+        dz = dst[2] - src[2]
+
+        # Same heading and pitch NodePath.lookAt would produce.
+        h = math.degrees(math.atan2(-dx, dy))
+        p = math.degrees(math.atan2(dz, math.sqrt(dx * dx + dy * dy)))
+
+        return math.sqrt(dx * dx + dy * dy + dz * dz), (h, p, 0)
+
+    def getEdge(self, src, dst):
+        return src * self.size + dst
+
+    def getNextPoint(self, index, doorState, occupancy=None, capacity=1):
+        # Trying to reach a point that depends on a door being open.
+        # If it's open, go ahead. Else, ignore this point.
+        for doorBit, target in self.gatedEdges[index]:
+            if doorState & doorBit:
+                return target
+
+        neighbours = self.neighbours[index]
+        if occupancy is None:
+            return random.choice(neighbours)
+
+        # Start at a random neighbour and take the first one with room left.
+        # None means every way out is full.
+        count = len(neighbours)
+        start = random.randrange(count)
+        for i in xrange(count):
+            target = neighbours[(start + i) % count]
+            if occupancy[target] < capacity:
+                return target
+
+        return None
+
+graph = CogGraph(PointMap, Connections)
@@ -0,0 +1,93 @@
+from FrameStats import getSection
+
+# Imported on first use, numpy costs a good part of the startup budget.
+np = None
+
+# Draws every walking cog from one per-frame task. Origins, velocities,
+# departure times and durations of the whole roster live in contiguous arrays,
+# indexed by Cog.moverIndex, so a frame costs a handful of array operations
+# plus one setPos per moving cog. Arrivals are logic events the cog
+# schedules in SimClock time; the mover only places cogs in between.
+class CogMover:
+    taskName = 'CogMover-task'
+
+    def __init__(self, clock, capacity=16):
+        self.clock = clock
+        self.cogs = []
+        self.__allocate(capacity)
+
+    @staticmethod
+    def isAvailable():
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                return False
+
+        return True
+
+    def __allocate(self, capacity):
+        self.origins = np.zeros((capacity, 3))
+        self.vel = np.zeros((capacity, 3))
+        self.departTime = np.zeros(capacity)
+        self.duration = np.zeros(capacity)
+        self.moving = np.zeros(capacity, dtype=bool)
+
+    def __getArrays(self):
+        return (self.origins, self.vel, self.departTime, self.duration, self.moving)
+
+    def __grow(self):
+        count = len(self.cogs)
+        old = self.__getArrays()
+        self.__allocate(max(16, count * 2))
+        for src, dst in zip(old, self.__getArrays()):
+            dst[:count] = src[:count]
+
+    def addCog(self, cog):
+        if len(self.cogs) == len(self.moving):
+            self.__grow()
+
+        cog.moverIndex = len(self.cogs)
+        self.cogs.append(cog)
+
+    def clear(self):
+        self.cogs = []
+        self.moving[:] = False
+
+    def start(self):
+        taskMgr.add(self.__update, self.taskName)
+
+    def stop(self):
+        taskMgr.remove(self.taskName)
+        self.moving[:] = False
+
+    def move(self, cog, start, end, time):
+        index = cog.moverIndex
+        self.origins[index] = start
+        self.vel[index] = end
+        self.vel[index] -= self.origins[index]
+        self.vel[index] /= time
+        self.departTime[index] = self.clock.getTime()
+        self.duration[index] = time
+        self.moving[index] = True
+
+    def stopCog(self, cog):
+        self.moving[cog.moverIndex] = False
+
+    def __update(self, task):
+        indices = np.flatnonzero(self.moving[:len(self.cogs)])
+        if not len(indices):
+            return task.cont
+
+        section = getSection('cogMover')
+        section.start()
+        elapsed = np.minimum(self.clock.getTime() - self.departTime[indices], self.duration[indices])
+        pos = self.origins[indices] + self.vel[indices] * elapsed[:, None]
+
+        cogs = self.cogs
+        for index, (x, y, z) in zip(indices.tolist(), pos.tolist()):
+            cogs[index].setPos(x, y, z)
+
+        section.stop()
+        return task.cont
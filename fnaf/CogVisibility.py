@@ -0,0 +1,129 @@
+import math
+
+from FactoryGlobals import CameraPoints, OfficeCameraPos, OfficeLookRange, CameraOffset, CameraFov, CameraNear
+from FactoryGlobals import FogFarDistance
+from CogGraph import graph
+
+try:
+    import PVSTable
+except ImportError:
+    PVSTable = None
+
+# Which views can possibly show a cog standing on each point or walking
+# along each edge. Views are the CameraPoints indices plus OFFICE_VIEW,
+# and each one is a bit in the masks below. The test is a conservative
+# frustum test against a sphere around the cog, sweeping base.cam through
+# the headings the flashlight can leave it at.
+
+OFFICE_VIEW = len(CameraPoints)
+ALL_VIEWS = (1 << (OFFICE_VIEW + 1)) - 1
+CAMERA_VIEWS = ALL_VIEWS & ~(1 << OFFICE_VIEW)
+
+CameraViewDistance = FogFarDistance
+CogRadius = 6
+CogCenterHeight = 4
+EdgeSamples = 8
+LookSamples = 9
+
+def _rotate(hpr, v):
+    h, p, r = [math.radians(x) for x in hpr]
+    x, y, z = v
+
+    # Roll about Y, then pitch about X, then heading about Z.
+    x, z = x * math.cos(r) + z * math.sin(r), -x * math.sin(r) + z * math.cos(r)
+    y, z = y * math.cos(p) - z * math.sin(p), y * math.sin(p) + z * math.cos(p)
+    x, y = x * math.cos(h) - y * math.sin(h), x * math.sin(h) + y * math.cos(h)
+    return x, y, z
+
+def _add(a, b):
+    return a[0] + b[0], a[1] + b[1], a[2] + b[2]
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+class Frustum:
+    def __init__(self, eye, hpr, parentHpr=(0, 0, 0)):
+        self.eye = eye
+        self.right = _rotate(parentHpr, _rotate(hpr, (1, 0, 0)))
+        self.forward = _rotate(parentHpr, _rotate(hpr, (0, 1, 0)))
+        self.up = _rotate(parentHpr, _rotate(hpr, (0, 0, 1)))
+
+        # The aspect ratio is unknown here, assume the vertical fov is as
+        # wide as the horizontal one.
+        self.tan = math.tan(math.radians(CameraFov / 2.0))
+        self.slack = CogRadius * math.sqrt(1 + self.tan * self.tan)
+
+    def containsSphere(self, center, radius=CogRadius):
+        v = (center[0] - self.eye[0], center[1] - self.eye[1], center[2] - self.eye[2])
+        depth = _dot(v, self.forward)
+        if depth < CameraNear - radius or depth > CameraViewDistance + radius:
+            return False
+
+        limit = depth * self.tan + self.slack
+        return abs(_dot(v, self.right)) <= limit and abs(_dot(v, self.up)) <= limit
+
+def _getLookHeadings():
+    step = 2.0 * OfficeLookRange / (LookSamples - 1)
+    return [-OfficeLookRange + step * i for i in xrange(LookSamples)]
+
+def getViewFrusta():
+    # One list of frusta per view; base.cam keeps its last flashlight
+    # heading while the browser is open, so every view sweeps it.
+    views = []
+    for pos, hpr, name in CameraPoints:
+        camPos = _add(OfficeCameraPos, CameraOffset)
+        eye = _add(pos, _rotate(hpr, camPos))
+        views.append([Frustum(eye, (h, 0, 0), hpr) for h in _getLookHeadings()])
+
+    views.append([Frustum(OfficeCameraPos, (h, 0, 0)) for h in _getLookHeadings()])
+    return views
+
+class VisibilityIndex:
+    def __init__(self):
+        views = getViewFrusta()
+
+        pointViews = [0] * graph.size
+        edgeViews = [0] * (graph.size * graph.size)
+
+        for index, pos in enumerate(graph.positions):
+            if pos is not None:
+                pointViews[index] = self.__getMask(views, [pos])
+
+            for target in graph.neighbours[index] + tuple(t for _, t in graph.gatedEdges[index]):
+                end = graph.positions[target]
+                samples = []
+                for i in xrange(EdgeSamples + 1):
+                    t = float(i) / EdgeSamples
+                    samples.append((pos[0] + (end[0] - pos[0]) * t, pos[1] + (end[1] - pos[1]) * t,
+                                    pos[2] + (end[2] - pos[2]) * t))
+
+                edgeViews[graph.getEdge(index, target)] = self.__getMask(views, samples)
+
+        # Drop views whose line of sight to a point is blocked by the level,
+        # as found by PVSBuilder.
+        if PVSTable is not None and len(PVSTable.PointViews) == graph.size:
+            pointViews = [mask & pvs for mask, pvs in zip(pointViews, PVSTable.PointViews)]
+
+        self.pointViews = tuple(pointViews)
+        self.edgeViews = tuple(edgeViews)
+
+    def __getMask(self, views, samples):
+        mask = 0
+        for view, frusta in enumerate(views):
+            for sample in samples:
+                center = (sample[0], sample[1], sample[2] + CogCenterHeight)
+                if any(frustum.containsSphere(center) for frustum in frusta):
+                    mask |= 1 << view
+                    break
+
+        return mask
+
+# Built on first use, it takes a while; Level.load asks for it up front.
+visibility = None
+
+def getVisibility():
+    global visibility
+    if visibility is None:
+        visibility = VisibilityIndex()
+
+    return visibility
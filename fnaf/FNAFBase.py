@@ -7,6 +7,16 @@ import sys, os, time, random
 from Level import Level
 from Camera import CameraControls
 from Timer import Timer
+from IntervalPool import IntervalPool
+from SimClock import SimClock
+from AssetLoader import AssetLoader
+import AssetBundle
+import WarmUp
+from StartupTimeline import timeline
+from NightSnapshot import NightSnapshot
+from PickIndex import PickIndex
+from FramePacer import FramePacer
+from FrameStats import FrameStats
 
 class FNAFBase(FSM):
     def __init__(self, withinTTH=False):
@@ -15,78 +25,168 @@ class FNAFBase(FSM):
         self.withinTTH = withinTTH
         
         if not self.withinTTH:
+            bundleFile = config.GetString('fnaf-asset-bundle', '')
+            if bundleFile:
+                AssetBundle.mount(bundleFile)
+                
             base.cogFont = loader.loadFont('data/vtRemingtonPortable.ttf')
             base.pixelFont = loader.loadFont('data/LCD_Solid.ttf')
+            timeline.mark('fonts')
             base.accept("escape", self.handleEsc)
             base.accept("f9", self.screenshot)
+            base.accept("f3", self.toggleFrameStats)
+            base.accept("f4", self.exportFrameStats)
             
         else:
             from toontown.toonbase import ToontownGlobals
             base.cogFont = ToontownGlobals.getSuitFont()
         
+        base.simClock = SimClock(timeScale=config.GetDouble('fnaf-time-scale', 1.0))
+        base.simClock.start()
+        base.intervalPool = IntervalPool()
+        base.pickIndex = PickIndex()
+        base.framePacer = FramePacer()
+        base.frameStats = FrameStats()
+        base.frameStats.start()
         base.level = Level()            
         base.timer = Timer()
         base.camControls = CameraControls()
+        timeline.mark('subsystems')
         
-        if not self.withinTTH:
-            self.handleGotPhases()
+        # Full frame rate while anything on screen moves.
+        base.framePacer.addCheck(ivalMgr.getNumIntervals)
+        base.framePacer.addCheck(base.camControls.isViewChanging)
+        base.framePacer.addCheck(self.isLoading)
+        base.framePacer.start()
         
-        self.ray = CollisionRay()
-        cNode = CollisionNode('mousePicker')
-        cNode.addSolid(self.ray)
-        cNode.setCollideMask(BitMask32(8))
-        self.cnp = base.cam.attachNewNode(cNode)
+        self.assetLoader = None
+        self.pendingNight = None
+        self.snapshot = None
         
-        self.handler = CollisionHandlerQueue()
-        self.clickTrav = CollisionTraverser('cTrav')
-        self.clickTrav.addCollider(self.cnp, self.handler)
-        base.accept('mouse1', self.__handleClick)
+        if not self.withinTTH:
+            self.handleGotPhases()
         
         self.night = 1
         
     def handleGotPhases(self):
-        base.level.load()
-        base.camControls.browser.load()
+        # Models stream in on the loader threads while the menu is up;
+        # the level and browser are built as soon as their files are in,
+        # then the level is put on the GPU.
+        self.assetLoader = AssetLoader()
+        self.assetLoader.addModels('levelModels', base.level.getModelFiles())
+        self.assetLoader.addStep('level', base.level.load, ['levelModels'])
+        self.assetLoader.addStep('browser', base.camControls.getBrowser, ['level'])
+        self.assetLoader.addStep('warmUp', self.warmUp, ['browser'])
+        self.assetLoader.start(self.__handleLoadProgress, self.__handleAssetsLoaded)
+        
+    def warmUp(self):
+        WarmUp.warmUp(base.level.np)
+        
+    def isLoaded(self):
+        return self.assetLoader is not None and self.assetLoader.isDone()
+        
+    def isLoading(self):
+        return self.assetLoader is not None and not self.assetLoader.isDone()
+        
+    def __handleLoadProgress(self, progress):
+        if self.state == 'Menu':
+            self.loadingBar['value'] = progress * 100
+            
+    def __handleAssetsLoaded(self):
+        self.__markStartup('assets loaded')
+        
+        if self.state == 'Menu':
+            self.loadingBar.hide()
+            
+        if self.pendingNight is not None:
+            night, self.pendingNight = self.pendingNight, None
+            self.demand('Game', night)
+            
+    def __markStartup(self, phase):
+        if timeline.getTime(phase) is not None:
+            return
+            
+        timeline.mark(phase)
+        if timeline.getTime('menu drawn') is not None and timeline.getTime('assets loaded') is not None:
+            timeline.report()
+            
+    def __handleMenuDrawn(self, task):
+        self.__markStartup('menu drawn')
+        return task.done
+        
+    def startNight(self, night=1):
+        # Waits for the assets when they're still loading.
+        if not self.isLoaded():
+            self.pendingNight = night
+            return
+            
+        self.demand('Game', night)
         
     def __handleClick(self):
+        # Door buttons are only on screen in the office; with the CCTV feeds
+        # up base.cam still sits there, hidden.
+        if base.camControls.state != 'Flashlight':
+            return
+            
         m = base.mouseWatcherNode
         if m.hasMouse():
             mpos = m.getMouse()
-            self.ray.setFromLens(base.camNode, mpos.getX(), mpos.getY())
-      
-        self.clickTrav.traverse(render)
-        numEntries = self.handler.getNumEntries()
-        if numEntries > 0:
-            self.handler.sortEntries()
-            for i in xrange(numEntries):
-                np = self.handler.getEntry(0).getIntoNodePath()
-                messenger.send('click-%s' % np.getName())
+            base.pickIndex.pick(mpos.getX(), mpos.getY())
         
     def enterGame(self, night=1):
         self.night = night
         self.__saveProgess()
+        self.__seedNight()
         
         base.transitions.irisIn()
+        base.intervalPool.mark()
+        base.simClock.resume()
         base.level.enter(night)
         base.timer.enter(night)
         base.camControls.enter()
         base.accept("ranOutOfEnergy", self.__handleRanOutOfEnergy)
         base.accept("gameFailed", self.__doFail)
         base.accept("dayComplete", self.__doSuccess)
+        base.accept('mouse1', self.__handleClick)
+        
+        self.snapshot = NightSnapshot()
+        
+    def __seedNight(self):
+        # A fixed seed makes a night replay identically at any time scale.
+        seed = config.GetInt('fnaf-sim-seed', 0)
+        if seed:
+            random.seed(seed + self.night)
+            
+    def restartNight(self):
+        # Starts the night over without leaving the Game state.
+        if self.state != 'Game':
+            return
+            
+        base.intervalPool.report()
+        base.intervalPool.mark()
+        self.__seedNight()
+        self.snapshot.restore()
+        base.simClock.resume()
+        base.transitions.irisIn()
         
     def exitGame(self):
+        self.snapshot = None
+        base.intervalPool.report()
         base.level.exit()
         base.timer.exit()
         base.camControls.exit()
         base.ignore("ranOutOfEnergy")
         base.ignore("gameFailed")
+        base.ignore('mouse1')
         
     def handleEsc(self):
         sys.exit()
         
     def __handleRanOutOfEnergy(self):
+        # The night stops while the dance plays in real time.
+        base.simClock.pause()
         base.level.stopAllCogs()
-        cog = random.choice(list(base.level.cogs))
+        cog = random.choice(base.level.cogs)
         cog.setPos(0)
         cog.setHpr(180, 0, 0)
         base.camControls.demand('Flashlight')
@@ -94,22 +194,16 @@ class FNAFBase(FSM):
         cog.danceAndGameOver()
         
     def __doFail(self):
-        def restartNight():
-            self.demand('RestartNight')
-            
-        Sequence(Func(base.transitions.irisOut), Wait(.5),
-                 Func(restartNight)).start()
-        
-    def enterRestartNight(self):
-        base.transitions.noTransitions()
+        base.intervalPool.get('FNAFBase-fail', self.__makeFailIval).start()
         
-        def __doEnterGame(task):
-            self.request('Game', self.night)
-            return task.done
-        
-        taskMgr.doMethodLater(0, __doEnterGame, 'fnafbase-doEnterGame')
+    def __makeFailIval(self):
+        return Sequence(Func(base.transitions.irisOut), Wait(.5),
+                        Func(self.restartNight))
         
     def __doSuccess(self):
+        # Nothing may happen to a won night during the iris out.
+        base.simClock.pause()
+        
         def advance():
             if self.night == 5:
                 self.gameComplete()
@@ -133,6 +227,12 @@ class FNAFBase(FSM):
             
         base.win.saveScreenshot("screenshots/five-nights-at-the-factory-%s.jpg" % time.time())
         
+    def toggleFrameStats(self):
+        base.frameStats.toggleOverlay()
+        
+    def exportFrameStats(self):
+        base.frameStats.export()
+        
     def gameComplete(self):
         if self.withinTTH:
             messenger.send("FNAF-gameComplete")
@@ -147,15 +247,24 @@ class FNAFBase(FSM):
         self.title = OnscreenText(text="Five Nights at the Factory", pos=(0, .8), font=base.cogFont,
                                   fg=(1, 1, 1, 1), scale=.15, wordwrap=1.6 / .15)
         self.newGameButton = DirectButton(text="NEW GAME", pos=(0, 0, -.2), text_font=base.pixelFont, relief=None,
-                                          scale=.1, text_fg=(1, 1, 1, 1), command=self.demand, extraArgs=['Game'])
+                                          scale=.1, text_fg=(1, 1, 1, 1), command=self.startNight)
         self.continueButton = DirectButton(text="CONTINUE", pos=(0, 0, -.6), text_font=base.pixelFont, relief=None,
                                            scale=.1, text_fg=(1, 1, 1, 1), command=self.__continue)
+        self.loadingBar = DirectWaitBar(pos=(0, 0, -.85), frameSize=(-.8, .8, -.02, .02), range=100,
+                                        frameColor=(.2, .2, .2, 1), barColor=(1, 1, 1, 1), relief=DGG.FLAT)
+        self.loadingBar['value'] = self.assetLoader.getProgress() * 100 if self.assetLoader else 0
+        if self.isLoaded():
+            self.loadingBar.hide()
+            
+        # Runs right after the frame is rendered.
+        taskMgr.add(self.__handleMenuDrawn, 'fnafbase-menuDrawn', sort=60)
                                            
     def exitMenu(self):
         self.bgFrame.removeNode()
         self.title.removeNode()
         self.newGameButton.removeNode()
         self.continueButton.removeNode()
+        self.loadingBar.destroy()
                                            
     def __continue(self):
         lastNight = 1
@@ -166,7 +275,7 @@ class FNAFBase(FSM):
         if not 1 <= lastNight <= 5:
             lastNight = 1
             
-        self.demand('Game', lastNight)
+        self.startNight(lastNight)
         
     def __saveProgess(self):
         try:
@@ -178,8 +287,11 @@ class FNAFBase(FSM):
             
     def startGame(self):
         base.camControls.load()
-        nextState = "Menu" if not self.withinTTH else "Game"
-        self.demand(nextState)
+        if self.withinTTH:
+            self.startNight()
+            
+        else:
+            self.demand('Menu')
         
     def leaveGame(self):
         self.demand('Off')
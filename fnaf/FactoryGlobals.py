@@ -0,0 +1,147 @@
+# Gameplay constants shared by the game and the headless NightSimulator.
+# Nothing in here may depend on Panda3D.
+
+import math
+
+SecondsPerHour = 60
+EndHour = 6
+TotalEnergy = int(SecondsPerHour * EndHour * 2.2)
+
+BaseEnergyConsumption = 1
+DoorEnergyConsumption = 3
+BrowserEnergyConsumption = 2
+
+CameraPoints = (
+                ((66.6, -20.7, 7.2), (0, 0, 0), "Hallway"),
+                ((-112.694, -35.0187, 23.3818), (-3.71871, -19.9784, -0.604477), "Left Room"), 
+                ((-110, 95, 40), (0, -25.9784, -0.604477), "Control Room (Camera 1)"),
+                ((-130, 95, 40), (0, -25.9784, -0.604477), "Control Room (Camera 2)"),
+                ((65.0658, 195.454, 13.3796), (-3.71871, -19.9784, -0.604477), "Safe Room")
+)
+
+# Flashlight (office) view: base.cam sits here and turns up to
+# OfficeLookRange degrees either way. CCTV views put base.camera at
+# CameraOffset from the chosen CameraPoints node.
+OfficeCameraPos = (0, -27, 5)
+OfficeLookRange = 45
+CameraOffset = (0, 30, -10)
+CameraFov = 52
+CameraNear = 5
+
+# The level is lit by black exponential fog. Past FogFarDistance it lets
+# less than FogThreshold of a surface's colour through, which is already
+# pure black on screen, so cameras don't draw any further than that.
+FogDensity = .03
+FogThreshold = 1 / 255.0
+FogFarDistance = math.log(1 / FogThreshold) / FogDensity
+
+# Level layout, shared by Level.load and the offline PVSBuilder: cashbot
+# HQ quadrants as (zone code, pos, hpr, z scale), then the door placements.
+LevelQuadrants = (
+                  ("15", (0, 0, 0), (0, 0, 0), 1),
+                  ("17", (66.5, 97, 0), (0, 0, 0), 1),
+                  ("08", (-111, 0, 0), (0, 0, 0), 1),
+                  ("04", (-111, 150, 10), (0, 0, 0), 1),
+                  ("03", (67, 238, 0), (180, 0, 0), .5)
+)
+
+StaticDoors = (
+               {'pos': (-111, 90, 10), 'scale': (.8, 1, .75), 'state': 'Open'},
+               {'pos': (-111, 220, 10), 'scale': (.8, 1, .75), 'state': 'Closed'}
+)
+
+DynamicDoors = (
+                {'pos': (45, 0, 0), 'hpr': (90, 0, 0), 'scale': .65, 'buttonPos': (0, 20, 0), 'state': 'Open'},
+                {'pos': (-45, 0, 0), 'hpr': (90, 0, 0), 'scale': .65, 'buttonPos': (0, -20, 0), 'state': 'Open'}
+)
+
+CogSpeeds = {'A': 10, 'B': 15, 'C': 12}
+CogStartPoints = {'A': 14, 'B': 18, 'C': 15}
+CogStartHeadings = {'A': 220, 'B': 40, 'C': 155}
+
+# Cogs spawned by Level.load, as (suit type, start point) pairs.
+DefaultRoster = (('A', 14), ('B', 18), ('C', 15))
+
+# The swarm night spreads this many cogs over every point a cog can stand
+# on outside the office and the door points, letting each point hold
+# several of them.
+SwarmTypes = ('A', 'B', 'C')
+SwarmStartPoints = (3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 18, 19)
+SwarmPointCapacity = 16
+
+def makeSwarmRoster(size):
+    return tuple((SwarmTypes[i % len(SwarmTypes)], SwarmStartPoints[i % len(SwarmStartPoints)])
+                 for i in xrange(size))
+
+# Index into CameraPoints of the camera that wakes each cog type
+# on 'onCamera-N' nights.
+CogWatchCameras = {'A': 3, 'B': 4, 'C': 2}
+
+CogBehaviours = {
+'A': {
+      1: {
+          'awake': 3,
+          'walkDelay': .35,
+         },
+      2: {
+          'awake': 2,
+          'walkDelay': .1,
+         },
+      3: {
+          'awake': 1,
+          'walkDelay': 0,
+         },
+      4: {
+          'awake': 0,
+          'walkDelay': 0,
+         },
+      5: {
+          'awake': 0,
+          'walkDelay': 0,
+         }
+    },
+'B': {
+      1: {
+          'awake': 'onCamera-0',
+          'walkDelay': 0,
+         },
+      2: {
+          'awake': 'onCamera-3',
+          'walkDelay': .3,
+         },
+      3: {
+          'awake': 'onCamera-2',
+          'walkDelay': .15,
+         },
+      4: {
+          'awake': 'onCamera-1',
+          'walkDelay': 0,
+         },
+      5: {
+          'awake': 'onCamera-1',
+          'walkDelay': 0,
+         }
+    },
+'C': {
+      1: {
+          'awake': 0,
+          'walkDelay': 0,
+         },
+      2: {
+          'awake': 'onCamera-0',
+          'walkDelay': 0,
+         },
+      3: {
+          'awake': 'onCamera-0',
+          'walkDelay': .05,
+         },
+      4: {
+          'awake': 'onCamera-3',
+          'walkDelay': 0,
+         },
+      5: {
+          'awake': 'onCamera-2',
+          'walkDelay': 0,
+         }
+    }
+}
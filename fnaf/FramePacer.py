@@ -0,0 +1,110 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import *
+
+MouseMoveEvent = 'fnaf-mouseMoved'
+
+# Watches for anything that changes the screen and caps the frame rate
+# when nothing has for idleDelay seconds, e.g. while staring at a quiet
+# CCTV feed. Input counts (the pointer moving, which also sends
+# MouseMoveEvent with the new position, or any button going down), as
+# does every check added with addCheck returning true. The first frame
+# with activity lifts the cap again.
+class FramePacer:
+    notify = directNotify.newCategory('FramePacer')
+    taskName = 'FramePacer-task'
+    buttonEvent = 'FramePacer-buttonDown'
+
+    def __init__(self):
+        self.idleRate = config.GetDouble('fnaf-idle-frame-rate', 10)
+        self.idleDelay = config.GetDouble('fnaf-idle-delay', 1.0)
+        self.throttle = config.GetBool('fnaf-idle-throttle', not base.withinTTH)
+
+        # What the clock did before we got to it, restored when active.
+        self.activeMode = globalClock.getMode()
+        self.activeRate = config.GetDouble('clock-frame-rate', 1.0)
+
+        self.checks = []
+        self.buttonThrower = None
+        self.mouseX = None
+        self.mouseY = None
+        self.lastActive = 0
+        self.idle = False
+
+    def start(self):
+        self.lastActive = globalClock.getRealTime()
+        if self.throttle and base.mouseWatcher:
+            # A thrower of our own next to ShowBase's; its per-button events
+            # go out under a prefix nobody listens to.
+            thrower = ButtonThrower(self.buttonEvent)
+            thrower.setPrefix('FramePacer-')
+            thrower.setButtonDownEvent(self.buttonEvent)
+            self.buttonThrower = base.mouseWatcher.attachNewNode(thrower)
+            base.accept(self.buttonEvent, self.__handleButton)
+
+        taskMgr.add(self.__update, self.taskName, sort=-50)
+
+    def stop(self):
+        taskMgr.remove(self.taskName)
+        base.ignore(self.buttonEvent)
+        if self.buttonThrower:
+            self.buttonThrower.removeNode()
+            self.buttonThrower = None
+
+        self.setIdle(False)
+
+    def addCheck(self, check):
+        self.checks.append(check)
+
+    def removeCheck(self, check):
+        if check in self.checks:
+            self.checks.remove(check)
+
+    def getMouse(self):
+        return self.mouseX, self.mouseY
+
+    def poke(self):
+        self.lastActive = globalClock.getRealTime()
+        if self.idle:
+            self.setIdle(False)
+
+    def setIdle(self, idle):
+        if idle == self.idle:
+            return
+
+        self.idle = idle
+        if not self.throttle:
+            return
+
+        if idle:
+            globalClock.setMode(ClockObject.MLimited)
+            globalClock.setFrameRate(self.idleRate)
+
+        else:
+            globalClock.setMode(self.activeMode)
+            globalClock.setFrameRate(self.activeRate)
+
+        self.notify.debug('idle' if idle else 'active')
+
+    def __handleButton(self, button):
+        self.poke()
+
+    def __update(self, task):
+        m = base.mouseWatcherNode
+        if m and m.hasMouse():
+            x = m.getMouseX()
+            y = m.getMouseY()
+            if x != self.mouseX or y != self.mouseY:
+                self.mouseX = x
+                self.mouseY = y
+                self.poke()
+                messenger.send(MouseMoveEvent, [x, y])
+
+        for check in self.checks:
+            if check():
+                self.poke()
+                break
+
+        if not self.idle and globalClock.getRealTime() - self.lastActive >= self.idleDelay:
+            self.setIdle(True)
+
+        return task.cont
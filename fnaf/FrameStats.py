@@ -0,0 +1,136 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.gui.OnscreenText import OnscreenText
+from panda3d.core import *
+import csv, os, time
+
+# Where frame time goes. Each hot path is a Section, timed with the real
+# clock for the overlay and CSV and with a PStatCollector for PStats;
+# intervals and rendering are read off their ShowBase tasks instead.
+# Every frame's numbers go in a ring buffer, the overlay shows their
+# rolling p50 / p99, and the whole buffer can be written out as CSV.
+
+SectionNames = ('cogAI', 'cogMover', 'timer', 'look', 'picking')
+TaskSections = (('intervals', 'ivalLoop'), ('render', 'igLoop'))
+
+class Section:
+    def __init__(self, name):
+        self.name = name
+        self.collector = PStatCollector('App:FNAF:%s' % name)
+        self.time = 0.0
+        self.startTime = 0.0
+
+    def start(self):
+        self.collector.start()
+        self.startTime = globalClock.getRealTime()
+
+    def stop(self):
+        self.time += globalClock.getRealTime() - self.startTime
+        self.collector.stop()
+
+sections = dict((name, Section(name)) for name in SectionNames)
+
+def getSection(name):
+    return sections[name]
+
+class FrameStats:
+    notify = directNotify.newCategory('FrameStats')
+    taskName = 'FrameStats-task'
+    overlayTaskName = 'FrameStats-overlay'
+
+    def __init__(self):
+        self.size = config.GetInt('fnaf-stats-frames', 600)
+        self.columns = ('total',) + SectionNames + tuple(name for name, taskName in TaskSections)
+
+        # One list per column, written round robin.
+        self.samples = [[0.0] * self.size for column in self.columns]
+        self.index = 0
+        self.count = 0
+        self.frameNumbers = [0] * self.size
+
+        self.overlay = None
+
+    def start(self):
+        # After igLoop, so this frame's render time is in.
+        taskMgr.add(self.__record, self.taskName, sort=55)
+
+    def stop(self):
+        taskMgr.remove(self.taskName)
+        self.hideOverlay()
+
+    def __record(self, task):
+        index = self.index
+        self.frameNumbers[index] = globalClock.getFrameCount()
+        self.samples[0][index] = globalClock.getDt()
+
+        column = 1
+        for name in SectionNames:
+            section = sections[name]
+            self.samples[column][index] = section.time
+            section.time = 0.0
+            column += 1
+
+        for name, taskName in TaskSections:
+            tasks = taskMgr.getTasksNamed(taskName)
+            self.samples[column][index] = tasks[0].getDt() if tasks else 0.0
+            column += 1
+
+        self.index = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        return task.cont
+
+    def getPercentiles(self, column):
+        # (p50, p99) of the column over the recorded frames, in ms.
+        values = sorted(self.samples[column][:self.count])
+        if not values:
+            return 0.0, 0.0
+
+        return (values[len(values) // 2] * 1000,
+                values[min(len(values) - 1, int(len(values) * .99))] * 1000)
+
+    def toggleOverlay(self):
+        if self.overlay:
+            self.hideOverlay()
+
+        else:
+            self.showOverlay()
+
+    def showOverlay(self):
+        self.overlay = OnscreenText(parent=base.a2dTopLeft, pos=(.05, -.08), align=TextNode.ALeft,
+                                    fg=(1, 1, 1, 1), bg=(0, 0, 0, .6), scale=.04, mayChange=True)
+        self.overlay.setBin('gui-popup', 0)
+        taskMgr.doMethodLater(0, self.__updateOverlay, self.overlayTaskName)
+
+    def hideOverlay(self):
+        taskMgr.remove(self.overlayTaskName)
+        if self.overlay:
+            self.overlay.destroy()
+            self.overlay = None
+
+    def __updateOverlay(self, task):
+        lines = ['%-10s %6s %6s' % ('ms', 'p50', 'p99')]
+        for column, name in enumerate(self.columns):
+            lines.append('%-10s %6.2f %6.2f' % ((name,) + self.getPercentiles(column)))
+
+        self.overlay.setText('\n'.join(lines))
+        task.delayTime = .5
+        return task.again
+
+    def getRows(self):
+        # The recorded frames, oldest first, times in ms.
+        start = (self.index - self.count) % self.size
+        for i in xrange(self.count):
+            index = (start + i) % self.size
+            yield [self.frameNumbers[index]] + ['%.3f' % (column[index] * 1000) for column in self.samples]
+
+    def export(self, directory='stats'):
+        if not os.path.isdir(directory):
+            os.mkdir(directory)
+
+        path = os.path.join(directory, 'frames-%d.csv' % time.time())
+        with open(path, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(('frameNumber',) + tuple('%sMs' % column for column in self.columns))
+            writer.writerows(self.getRows())
+
+        self.notify.info('wrote %d frames to %s' % (self.count, path))
+        return path
@@ -0,0 +1,64 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import *
+
+# 2D overlay helpers. Static pieces are plain cards flattened into one geom
+# per render state, and widgets whose value changes move or scale a node
+# instead of regenerating their geometry. countDrawCalls tells what the
+# overlay costs.
+
+notify = directNotify.newCategory('HUD')
+
+# Last count reported per view, so each view only logs when it changes.
+reportedDrawCalls = {}
+
+class StaticBatch(NodePath):
+    def __init__(self, name, parent):
+        NodePath.__init__(self, name)
+        self.reparentTo(parent)
+
+    def addCard(self, frame, color):
+        cm = CardMaker('card')
+        cm.setFrame(*frame)
+        cm.setColor(*color)
+        self.attachNewNode(cm.generate())
+
+    def flatten(self):
+        # The colours are per vertex, so the cards share one render state
+        # and end up in a single geom.
+        self.flattenStrong()
+
+def countDrawCalls(np=None):
+    # Geoms drawn under np (render2d by default): geom nodes, generated
+    # text, and the current state of each DirectGui item.
+    if np is None:
+        np = render2d
+
+    node = np.node()
+    if node.isOverallHidden():
+        return 0
+
+    count = 0
+    if node.isGeomNode():
+        count += node.getNumGeoms()
+
+    elif isinstance(node, TextNode):
+        count += countDrawCalls(NodePath(node.getInternalGeom()))
+
+    if isinstance(node, PGItem):
+        count += countDrawCalls(node.getStateDef(node.getState()))
+
+    for child in np.getChildren():
+        count += countDrawCalls(child)
+
+    return count
+
+def reportDrawCalls(view):
+    # Walking render2d costs a frame's worth of time; skip it unless the
+    # count would be logged.
+    if not notify.getInfo():
+        return
+
+    count = countDrawCalls()
+    if reportedDrawCalls.get(view) != count:
+        reportedDrawCalls[view] = count
+        notify.info('%s: %d 2D draw calls' % (view, count))
@@ -0,0 +1,40 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+# Keeps every interval built by gameplay code, keyed by name, so that owners
+# replay (and retarget) the same interval instead of building a new one.
+class IntervalPool:
+    notify = directNotify.newCategory('IntervalPool')
+
+    def __init__(self):
+        self.intervals = {}
+        self.created = 0
+        self.reused = 0
+        self.createdAtMark = 0
+
+    def get(self, name, factory, *args):
+        ival = self.intervals.get(name)
+        if ival is None:
+            ival = factory(*args)
+            self.intervals[name] = ival
+            self.created += 1
+
+        else:
+            self.reused += 1
+
+        return ival
+
+    def release(self, name):
+        ival = self.intervals.pop(name, None)
+        if ival is not None:
+            ival.pause()
+
+    def mark(self):
+        self.createdAtMark = self.created
+
+    def getChurn(self):
+        # Intervals created since the last mark.
+        return self.created - self.createdAtMark
+
+    def report(self):
+        self.notify.info('%d pooled, %d created, %d reused, %d created since mark' % (
+                         len(self.intervals), self.created, self.reused, self.getChurn()))
@@ -1,9 +1,23 @@
 from direct.interval.IntervalGlobal import *
 from direct.fsm.FSM import FSM
+from direct.showbase.DirectObject import DirectObject
 from panda3d.core import *
 from Cog import Cog
+from AIScheduler import AIScheduler, ScheduledEvent
+from CogMover import CogMover
+from CogGraph import graph
+from CogVisibility import OFFICE_VIEW, getVisibility
+from FactoryGlobals import DoorEnergyConsumption, CameraFov, CameraNear, FogDensity, FogFarDistance
+from FactoryGlobals import DefaultRoster, SwarmPointCapacity, makeSwarmRoster
+from FactoryGlobals import LevelQuadrants, StaticDoors, DynamicDoors
+from FrameStats import getSection
+import PVS
+import LevelBake
 
 class CogDoor(NodePath, FSM):
+    slideTime = 1
+    prototypes = {}
+    
     def __init__(self, model, **kw):
         NodePath.__init__(self, self.__class__.__name__)
         FSM.__init__(self, self.__class__.__name__)
@@ -11,6 +25,9 @@ class CogDoor(NodePath, FSM):
         self.hpr = kw.get('hpr', (0, 0, 0))
         self.scale = kw.get('scale', 1)
         self.color = kw.get('color')
+        self.openingName = 'CogDoor-opening-%d' % id(self)
+        self.closingName = 'CogDoor-closing-%d' % id(self)
+        self.slideEvent = ScheduledEvent(self, CogDoor.finishSliding)
         
         self.setPos(self.pos)
         self.setHpr(self.hpr)
@@ -19,14 +36,38 @@ class CogDoor(NodePath, FSM):
             self.setColor(self.color)
         
         if model:
-            doorway = model.find('**/Doorway1')
-            doorway.find('**/doortop').removeNode()
-            doorway.find('**/doorbottom').removeNode()        
-            doorway.reparentTo(self)
+            # Our own copy of the prototype's doorway: the leaves slide and
+            # hide per door, the geometry itself is shared.
+            doorway = model.find('**/Doorway1').copyTo(self)
             
             self.doorLeft = doorway.find('**/doorLeft')
             self.doorRight = doorway.find('**/doorRight')
             
+    @classmethod
+    def getPrototype(cls, modelFile):
+        # Loaded and pruned once; doors and buttons copy from it.
+        prototype = cls.prototypes.get(modelFile)
+        if prototype is None:
+            prototype = loader.loadModel(modelFile)
+            for x in prototype.findAllMatches('**/Slide_*'):
+                x.removeNode()
+                
+            doorway = prototype.find('**/Doorway1')
+            if not doorway.isEmpty():
+                doorway.find('**/doortop').removeNode()
+                doorway.find('**/doorbottom').removeNode()
+                
+            cls.prototypes[modelFile] = prototype
+            
+        return prototype
+        
+    @classmethod
+    def clearPrototypes(cls):
+        for prototype in cls.prototypes.values():
+            prototype.removeNode()
+            
+        cls.prototypes = {}
+        
     def enterOpen(self):
         self.doorLeft.hide()
         self.doorRight.hide()
@@ -36,36 +77,41 @@ class CogDoor(NodePath, FSM):
         self.doorRight.show()
 
     def enterOpening(self):
-        time = 1
-        offset = 7.5
-        
-        leftDoorSeq = self.doorLeft.posInterval(time, (-offset, 0, 0), (0, 0, 0))
-        rightDoorSeq = self.doorRight.posInterval(time, (offset, 0, 0), (0, 0, 0))
-        
-        self.ival = Sequence(Parallel(leftDoorSeq, rightDoorSeq), Func(self.demand, 'Open'))
-        self.ival.start()
+        self.ival = base.intervalPool.get(self.openingName, self.makeSlideIval, 7.5, 0)
+        self.startSliding()
         
     def exitOpening(self):
-        self.ival.pause()
-        del self.ival
+        self.stopSliding()
         
     def enterClosing(self):
-        time = 1
-        offset = 7.5
-        
         self.doorLeft.show()
         self.doorRight.show()
         
-        leftDoorSeq = self.doorLeft.posInterval(time, (0, 0, 0), (-offset, 0, 0))
-        rightDoorSeq = self.doorRight.posInterval(time, (0, 0, 0), (offset, 0, 0))
-        
-        self.ival = Sequence(Parallel(leftDoorSeq, rightDoorSeq), Func(self.demand, 'Closed'))
-        self.ival.start()
+        self.ival = base.intervalPool.get(self.closingName, self.makeSlideIval, 0, 7.5)
+        self.startSliding()
         
     def exitClosing(self):
-        self.ival.pause()
+        self.stopSliding()
+        
+    def startSliding(self):
+        # The state change happens in sim time, the interval is just the look.
+        base.level.scheduler.schedule(self.slideEvent, self.slideTime)
+        self.ival.start(playRate=base.simClock.timeScale)
+        
+    def stopSliding(self):
+        base.level.scheduler.cancel(self.slideEvent)
+        self.ival.finish()
         del self.ival
         
+    def finishSliding(self):
+        self.demand('Open' if self.state == 'Opening' else 'Closed')
+        
+    def makeSlideIval(self, endOffset, startOffset):
+        leftDoorSeq = self.doorLeft.posInterval(self.slideTime, (-endOffset, 0, 0), (-startOffset, 0, 0))
+        rightDoorSeq = self.doorRight.posInterval(self.slideTime, (endOffset, 0, 0), (startOffset, 0, 0))
+        
+        return Parallel(leftDoorSeq, rightDoorSeq)
+        
 class DynamicCogDoor(CogDoor): 
     def __init__(self, model, **kw):
         CogDoor.__init__(self, model, **kw)
@@ -73,18 +119,15 @@ class DynamicCogDoor(CogDoor):
         if not buttonPos:
             raise ValueError("DynamicDoor requires buttonPos kw arg!")
             
-        self.button = loader.loadModel(self.getButtonModel())
-        self.button.reparentTo(self)
+        self.button = self.getPrototype(self.getButtonModel()).copyTo(self)
         self.button.setPos(buttonPos)
         self.button.setScale(3.5)
         self.buttonNode = self.button.find('**/button')
         
+        self.doorBit = 1 << kw.get('doorIndex', 0)
+        
         self.buttonName = 'Button-%s' % id(self)
         self.buttonEvent = 'click-' + self.buttonName
-        cNode = CollisionNode(self.buttonName)
-        cNode.addSolid(CollisionSphere(0, 0, 0, .8))
-        cNode.setCollideMask(BitMask32(8))
-        cnp = self.buttonNode.attachNewNode(cNode)
         
     def trigger(self):
         nextState = None
@@ -115,9 +158,16 @@ class DynamicCogDoor(CogDoor):
         CogDoor.exitClosing(self)
         self.releaseButton()
         
+    def enterOpen(self):
+        CogDoor.enterOpen(self)
+        base.level.doorState |= self.doorBit
+        
+    def exitOpen(self):
+        base.level.doorState &= ~self.doorBit
+        
     def enterClosed(self):
         CogDoor.enterClosed(self)
-        base.timer.addEnergyConsumption(self.buttonName, 3)
+        base.timer.addEnergyConsumption(self.buttonName, DoorEnergyConsumption)
         
     def exitClosed(self):
         base.timer.removeEnergyConsumption(self.buttonName)
@@ -133,84 +183,226 @@ class DynamicCogDoor(CogDoor):
     def isOpen(self):
         return self.state == 'Open'
         
-    def getButtonModel(self):
+    @staticmethod
+    def getButtonModel():
         if not base.withinTTH:
             return 'data/door_btn.bam'
             
         return "phase_9/models/cogHQ/CogDoor_Button"
             
-class Level:
+class Level(DirectObject):
     def __init__(self):
+        DirectObject.__init__(self)
         self.quadrants = set()
         self.np = NodePath("quadrants")
+        
+        self.scheduler = AIScheduler(base.simClock, getSection('cogAI'))
+        self.mover = None
+        
+        # Number of cogs standing at or walking to each point.
+        self.occupancy = [0] * graph.size
+        self.pointCapacity = 1
+        
+        # Bits of the views currently being rendered, see CogVisibility.
+        self.activeViews = 1 << OFFICE_VIEW
+        
+        # The night's cogs keyed by the hour / camera index that wakes them,
+        # nobody wakes up once stopAllCogs ended the night.
+        self.hourWakeups = {}
+        self.cameraWakeups = {}
+        self.cogsStopped = False
+        
+        # Bitmask of open dynamic doors, bit n set when dynamicDoors[n] is open.
+        self.doorState = 0
        
     def load(self):
-        self.addQuadrant("15", (0, 0, 0))
-        self.addQuadrant("17", (66.5, 97, 0))
-        self.addQuadrant("08", (-111, 0, 0))
-        self.addQuadrant("04", (-111, 150, 10))
-        self.addQuadrant("03", (67, 238, 0), (180, 0, 0), zScale=.5)
+        self.staticGeometry = self.loadStaticGeometry()
+        self.staticGeometry.reparentTo(self.np)
+        for code, pos, hpr, zScale in LevelQuadrants:
+            quad = self.staticGeometry.find('quadrant-%s' % code)
+            PVS.hideFromUnseenViews(quad, PVS.getQuadrantViews(code))
+            self.quadrants.add(quad)
+            
+        self.staticDoors = []
+        for index in xrange(len(StaticDoors)):
+            door = self.staticGeometry.find('staticDoor-%d' % index)
+            PVS.hideFromUnseenViews(door, PVS.getStaticDoorViews(index))
+            self.staticDoors.append(door)
+            
+        self.dynamicDoors = []
+        for kw in DynamicDoors:
+            self.addDynamicDoor(**kw)
         
-        self.addStaticDoor(pos=(-111, 90, 10), scale=(.8, 1, .75), state='Open')
-        self.addStaticDoor(pos=(-111, 220, 10), scale=(.8, 1, .75), state='Closed')
+        getVisibility()
         
-        self.dynamicDoors = []
-        self.addDynamicDoor(pos=(45, 0, 0), hpr=(90, 0, 0), scale=.65, buttonPos=(0, 20, 0), state='Open')
-        self.addDynamicDoor(pos=(-45, 0, 0), hpr=(90, 0, 0), scale=.65, buttonPos=(0, -20, 0), state='Open')
+        # Created here rather than up front, numpy is slow to import.
+        self.mover = CogMover(base.simClock) if CogMover.isAvailable() else None
         
-        self.cogs = set()
-        self.addCog('A', (-140, 170, 10), 220)
-        self.addCog('B', (72, 247, 0), 40)
-        self.addCog('C', (-100, 150, 10), 155)
+        # A list, in roster order, so a seeded night schedules and picks
+        # cogs the same way in every run.
+        self.cogs = []
+        roster, self.pointCapacity = self.getRoster()
+        for type, startPoint in roster:
+            self.addCog(type, startPoint)
         
         self.fog = Fog("darknessFog")
         self.fog.setColor(0, 0, 0)
-        self.fog.setExpDensity(.03)
+        self.fog.setExpDensity(FogDensity)
         self.np.setFog(self.fog)
         
         self.bgm = loader.loadMusic(self.getBgm())
         self.bgm.setLoopCount(0)
         
-    def addCog(self, type, pos, h=0):
-        cog = Cog(type)
+    def getRoster(self):
+        # (type, start point) pairs and how many cogs a point can hold.
+        swarmSize = config.GetInt('fnaf-swarm-size', 0)
+        if swarmSize > 0 and CogMover.isAvailable():
+            return makeSwarmRoster(swarmSize), SwarmPointCapacity
+            
+        return DefaultRoster, 1
+        
+    def getModelFiles(self):
+        # Every model file load() reads, so they can be fetched ahead of it.
+        bakeFile = self.getBakeFile()
+        sources = self.getStaticSources()
+        if bakeFile and LevelBake.isCurrent(bakeFile, sources):
+            files = [bakeFile, self.getDoorModel()]
+            
+        else:
+            files = sources
+            
+        files.append(DynamicCogDoor.getButtonModel())
+        
+        roster, capacity = self.getRoster()
+        for type in sorted(set(type for type, startPoint in roster)):
+            files.append(Cog.locateModelFile(type))
+            files.extend(Cog.locateAnimFile(anim, type) for anim in Cog.anims)
+            
+        return files
+        
+    def addCog(self, type, startPoint=None):
+        cog = Cog(type, startPoint)
         cog.reparentTo(self.np)
-        cog.loop('neutral')
-        cog.setPos(pos)
-        cog.setH(h)
+        cog.setAnim('neutral')
+        cog.resetPos()
         cog.setScale(1.75)
-        self.cogs.add(cog)
+        self.cogs.append(cog)
+        
+        if self.mover:
+            self.mover.addCog(cog)
+        
+        if cog.notify.getDebug():
+            usage = cog.getMemoryUsage()
+            cog.notify.debug('%s: %d vertex bytes, %d owned, anims %s' % (
+                             type, usage['vertexBytes'], usage['ownedVertexBytes'], usage['anims']))
         
     def enter(self, night=1):
         self.np.reparentTo(render)
-        base.camLens.setNear(5)
-        base.camLens.setFov(52)
+        base.camLens.setNear(CameraNear)
+        base.camLens.setFar(FogFarDistance)
+        base.camLens.setFov(CameraFov)
+        
+        # Whatever lies past the far plane shows the clear colour, which
+        # has to match the fog.
+        self.backgroundColor = base.getBackgroundColor()
+        base.setBackgroundColor(0, 0, 0)
         self.bgm.play()
+        self.scheduler.start()
+        if self.mover:
+            self.mover.start()
+            
+        self.occupancy = [0] * graph.size
         
         for door in self.dynamicDoors:
             door.accept(door.buttonEvent, door.trigger)
             
+        self.hourWakeups = {}
+        self.cameraWakeups = {}
+        self.cogsStopped = False
         for cog in self.cogs:
             cog.resetPos()
+            self.occupancy[cog.startPoint.pointIndex] += 1
             
-            if cog.type == "A": quad = "ControlRoomCamera2"
-            elif cog.type == "B": quad = "SafeRoom"
-            elif cog.type == "C": quad = "ControlRoomCamera1"
+            cog.initialiseAIBehaviours(night)
+            self.hourWakeups.setdefault(cog.awakeHour, []).append(cog)
+            if cog.awakeCamera is not None:
+                self.cameraWakeups.setdefault(cog.awakeCamera, []).append(cog)
                 
-            cog.initialiseAIBehaviours(night, quad)
-            
+        self.accept("enterHour", self.handleEnterHour)
         self.night = night
         
     def exit(self):
         self.np.detachNode()
         self.bgm.stop()
+        base.setBackgroundColor(self.backgroundColor)
         
         for door in self.dynamicDoors:
             door.ignore(door.buttonEvent)
             door.demand('Open')
             
+        self.ignore("enterHour")
         self.stopAllCogs()
+        self.scheduler.stop()
+        if self.mover:
+            self.mover.stop()
             
+    def restore(self, cogTransforms, doorStates, occupancy):
+        # Back to the start of the night without leaving it, see
+        # NightSnapshot. The wakeup tables stay as they are, wakeUp does
+        # nothing for a cog that's already awake.
+        for door, state in doorStates:
+            if door.state != state:
+                door.demand(state)
+                
+        for cog, transform in cogTransforms:
+            cog.stopAIBehaviours()
+            cog.restore(transform)
+            
+        self.occupancy[:] = occupancy
+        self.cogsStopped = False
+        
+    def handleEnterHour(self, hour):
+        if self.cogsStopped:
+            return
+            
+        for cog in self.hourWakeups.get(hour, ()):
+            cog.wakeUp()
+            
+    def handleCameraSeeing(self, cameraIndex):
+        if self.cogsStopped:
+            return
+            
+        for cog in self.cameraWakeups.get(cameraIndex, ()):
+            cog.wakeUp()
+            
+    def setActiveView(self, view):
+        self.setActiveViews(1 << view)
+        
+    def setActiveViews(self, views):
+        self.activeViews = views
+        for cog in self.cogs:
+            cog.updateCulling(views)
+            
+    def getMovingViews(self):
+        # Views that have a cog walking through them right now.
+        views = 0
+        for cog in self.cogs:
+            if cog.arriveEvent.isScheduled():
+                views |= cog.viewMask
+                
+        return views
+            
+    def isViewChanging(self, view):
+        # Whether a cog shows in the view, standing cogs animate too.
+        viewBit = 1 << view
+        for cog in self.cogs:
+            if cog.viewMask & viewBit and not cog.culled:
+                return True
+                
+        return False
+        
     def stopAllCogs(self):
+        self.cogsStopped = True
         for cog in self.cogs:
             cog.stopAIBehaviours()
         
@@ -220,41 +412,86 @@ class Level:
             
         self.quadrants = set()
         
+        for door in self.dynamicDoors:
+            base.pickIndex.remove(door.buttonName)
+            base.intervalPool.release(door.openingName)
+            base.intervalPool.release(door.closingName)
+            
+        for cog in self.cogs:
+            base.intervalPool.release(cog.walkPathName)
+            base.intervalPool.release(cog.danceName)
+            
+        if self.mover:
+            self.mover.clear()
+            
         self.np.removeNode()
+        Cog.clearPrototypes()
+        CogDoor.clearPrototypes()
+        
+    def getBakeFile(self):
+        return config.GetString('fnaf-level-bake', '' if base.withinTTH else 'data/level.bam')
+        
+    def getStaticSources(self):
+        return [self.getQuadrantModel(code) for code, pos, hpr, zScale in LevelQuadrants] + [self.getDoorModel()]
+        
+    def loadStaticGeometry(self):
+        # Quadrants and static doors come flattened out of the bake, which
+        # is rebuilt here whenever it's missing or stale.
+        bakeFile = self.getBakeFile()
+        if bakeFile:
+            root = LevelBake.load(bakeFile, self.getStaticSources())
+            if root:
+                return root
+                
+        root = self.assembleStaticGeometry()
+        if bakeFile:
+            LevelBake.write(root, bakeFile)
+            
+        return root
+        
+    def assembleStaticGeometry(self):
+        pieces = []
+        for code, pos, hpr, zScale in LevelQuadrants:
+            quad = self.loadQuadrant(code)
+            quad.setPos(pos)
+            quad.setHpr(hpr)
+            quad.setSz(zScale)
+            pieces.append(('quadrant-%s' % code, quad))
+            
+        doors = []
+        for index, kw in enumerate(StaticDoors):
+            door = CogDoor(CogDoor.getPrototype(self.getDoorModel()), **kw)
+            door.demand(kw.get('state', 'Closed'))
+            pieces.append(('staticDoor-%d' % index, door))
+            doors.append(door)
+            
+        root = LevelBake.bake(pieces)
+        for name, np in pieces:
+            np.removeNode()
+            
+        for door in doors:
+            door.cleanup()
+            
+        return root
         
-    def loadQuadrant(self, code):
+    def getQuadrantModel(self, code):
         modelPrefix = 'data/'
         if base.withinTTH:
             modelPrefix = 'phase_10/models/cashbotHQ/'
             
-        return loader.loadModel('%sZONE%sa.bam' % (modelPrefix, code))
-       
-    def addQuadrant(self, code, pos, hpr=(0, 0, 0), zScale=1):
-        quad = self.loadQuadrant(code)
-        quad.reparentTo(self.np)
-        quad.setPos(pos)
-        quad.setHpr(hpr)
-        quad.setSz(zScale)
-        self.quadrants.add(quad)
-
-    def addStaticDoor(self, **kw):
-        doorModel = loader.loadModel(self.getDoorModel())
-        for x in doorModel.findAllMatches('**/Slide_*'):
-            x.removeNode()
-            
-        door = CogDoor(doorModel, **kw)
-        door.reparentTo(self.np)
-        door.demand(kw.get('state', 'Closed'))
+        return '%sZONE%sa.bam' % (modelPrefix, code)
+        
+    def loadQuadrant(self, code):
+        return loader.loadModel(self.getQuadrantModel(code))
         
     def addDynamicDoor(self, **kw):
-        doorModel = loader.loadModel(self.getDoorModel())
-        for x in doorModel.findAllMatches('**/Slide_*'):
-            x.removeNode()
-            
-        door = DynamicCogDoor(doorModel, **kw)
+        doorModel = CogDoor.getPrototype(self.getDoorModel())
+        door = DynamicCogDoor(doorModel, doorIndex=len(self.dynamicDoors), **kw)
         door.reparentTo(self.np)
         door.demand(kw.get('state', 'Closed'))
         door.releaseButton()
+        base.pickIndex.add(door.buttonName, door.buttonNode, .8)
+        PVS.hideFromUnseenViews(door, PVS.getDynamicDoorViews(len(self.dynamicDoors)))
         self.dynamicDoors.append(door)
         
     def getDoorModel(self):
@@ -0,0 +1,74 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import *
+
+from FactoryGlobals import LevelQuadrants, StaticDoors
+
+# The static part of the level (quadrants and static doors) is assembled,
+# pruned and flattened once and cached in a single bam. Every piece stays
+# a node of its own, so PVS can still hide it per view; within a piece,
+# flattenStrong merges the geoms that share a render state. The bake is
+# used while it's newer than every source model and was made from the
+# current layout.
+
+notify = directNotify.newCategory('LevelBake')
+
+LayoutTag = 'fnaf-layout'
+
+def getLayoutKey():
+    return repr((LevelQuadrants, StaticDoors))
+
+def getTimestamp(path):
+    filename = Filename(path)
+    if not filename.getExtension():
+        filename.setExtension('bam')
+
+    vfs = VirtualFileSystem.getGlobalPtr()
+    if not vfs.resolveFilename(filename, getModelPath().getValue()):
+        return None
+
+    return vfs.getFile(filename).getTimestamp()
+
+def isCurrent(bakeFile, sources):
+    bakeTime = getTimestamp(bakeFile)
+    if bakeTime is None:
+        return False
+
+    for source in sources:
+        sourceTime = getTimestamp(source)
+        if sourceTime is None or sourceTime > bakeTime:
+            return False
+
+    return True
+
+def bake(pieces):
+    # pieces are (name, NodePath) pairs, already placed in level space.
+    root = NodePath(ModelRoot('levelBake'))
+    root.setTag(LayoutTag, getLayoutKey())
+    for name, np in pieces:
+        piece = np.copyTo(root)
+        piece.setName(name)
+
+        # Whatever is hidden now (open door leaves) never shows up.
+        for node in piece.findAllMatches('**'):
+            if not node.isEmpty() and node.node().isOverallHidden():
+                node.removeNode()
+
+        before = piece.findAllMatches('**/+GeomNode').getNumPaths()
+        piece.flattenStrong()
+        notify.info('%s: %d geom nodes flattened to %d' % (name, before, piece.findAllMatches('**/+GeomNode').getNumPaths()))
+
+    return root
+
+def load(bakeFile, sources):
+    if not isCurrent(bakeFile, sources):
+        return None
+
+    root = loader.loadModel(bakeFile, okMissing=True)
+    if root is None or root.getTag(LayoutTag) != getLayoutKey():
+        return None
+
+    return root
+
+def write(root, bakeFile):
+    if not root.writeBamFile(Filename.fromOsSpecific(bakeFile)):
+        notify.warning("couldn't write level bake to %s" % bakeFile)
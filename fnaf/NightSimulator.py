@@ -0,0 +1,283 @@
+import numpy as np
+
+import FactoryGlobals
+from FactoryGlobals import CogBehaviours, CogSpeeds, CogStartPoints, CogWatchCameras, CameraPoints
+from CogGraph import graph
+
+# Headless Monte Carlo model of a night. Every array has one entry per
+# simulated night (times one per cog where it applies). Nights don't share
+# a clock: each pass over the batch moves every night straight to its own
+# next event (a cog waking, arriving or leaving, a door closing, the
+# energy running out) instead of ticking through the quiet time between.
+#
+# The player is modelled by two knobs:
+#  - browserDuty: chance that the camera browser is open during a step.
+#    While open it drains energy and shows one random camera, which wakes
+#    the 'onCamera-N' cogs watched by it. Its drain is taken at the mean.
+#  - doorReaction: chance per step that the player notices a cog at (or
+#    walking to) the point in front of a door and closes it. Doors are
+#    reopened as soon as nobody is there.
+
+SURVIVED = 0
+CAUGHT = 1
+OUT_OF_ENERGY = 2
+
+OFFICE_POINT = 1
+NEXT_POINT_DELAY = 2.5
+
+ASLEEP = 0
+WAITING = 1
+WALKING = 2
+
+class NightResults:
+    def __init__(self, outcome, endTime, culprit):
+        self.outcome = outcome
+        self.endTime = endTime
+        self.culprit = culprit
+
+    def __len__(self):
+        return len(self.outcome)
+
+    def getRate(self, outcome):
+        return np.count_nonzero(self.outcome == outcome) / float(len(self))
+
+    def getWinRate(self):
+        return self.getRate(SURVIVED)
+
+class NightSimulator:
+    def __init__(self, cogTypes=('A', 'B', 'C'), secondsPerHour=FactoryGlobals.SecondsPerHour,
+                 endHour=FactoryGlobals.EndHour, totalEnergy=FactoryGlobals.TotalEnergy,
+                 behaviours=CogBehaviours, step=.5):
+        self.cogTypes = tuple(cogTypes)
+        self.secondsPerHour = secondsPerHour
+        self.endHour = endHour
+        self.totalEnergy = totalEnergy
+        self.behaviours = behaviours
+        self.step = step
+
+        self.__compileGraph()
+
+        self.speeds = np.array([CogSpeeds[type] for type in self.cogTypes], dtype=np.float64)
+        self.startPoints = np.array([CogStartPoints[type] for type in self.cogTypes], dtype=np.int64)
+        self.watchCameras = np.array([CogWatchCameras[type] for type in self.cogTypes], dtype=np.int64)
+
+    def __compileGraph(self):
+        size = graph.size
+
+        maxDegree = max(1, max(len(n) for n in graph.neighbours))
+        maxGated = max(1, max(len(g) for g in graph.gatedEdges))
+
+        self.degrees = np.zeros(size, dtype=np.int64)
+        self.neighbours = np.zeros((size, maxDegree), dtype=np.int64)
+        self.gatedBits = np.zeros((size, maxGated), dtype=np.int64)
+        self.gatedTargets = np.zeros((size, maxGated), dtype=np.int64)
+
+        for index in xrange(size):
+            free = graph.neighbours[index]
+            self.degrees[index] = len(free)
+            self.neighbours[index, :len(free)] = free
+
+            for column, (doorBit, target) in enumerate(graph.gatedEdges[index]):
+                self.gatedBits[index, column] = doorBit
+                self.gatedTargets[index, column] = target
+
+        self.edgeLengths = np.array(graph.edgeLengths, dtype=np.float64)
+
+        # Doors are guarded at the point their gated edge leaves from.
+        guards = {}
+        for index in xrange(size):
+            for doorBit, target in graph.gatedEdges[index]:
+                guards[doorBit] = index
+
+        self.doorBits = np.array(sorted(guards), dtype=np.int64)
+        self.doorGuards = np.array([guards[bit] for bit in sorted(guards)], dtype=np.int64)
+
+    def __getBehaviourArrays(self, night):
+        awakeHours = []
+        byCamera = []
+        walkDelays = []
+
+        for type in self.cogTypes:
+            behaviours = self.behaviours[type][night]
+            awakeTime = behaviours['awake']
+            camera = isinstance(awakeTime, str)
+            if camera:
+                _, awakeTime = awakeTime.split('-')
+                awakeTime = int(awakeTime)
+
+            awakeHours.append(awakeTime)
+            byCamera.append(camera)
+            walkDelays.append(behaviours['walkDelay'] * self.secondsPerHour)
+
+        return (np.array(awakeHours, dtype=np.int64), np.array(byCamera, dtype=bool),
+                np.array(walkDelays, dtype=np.float64))
+
+    def run(self, night, count, browserDuty=.25, doorReaction=.9, seed=None):
+        rng = np.random.RandomState(seed)
+        awakeHours, byCamera, walkDelays = self.__getBehaviourArrays(night)
+
+        numCogs = len(self.cogTypes)
+        numDoors = len(self.doorBits)
+        numCameras = len(CameraPoints)
+        size = graph.size
+        dt = self.step
+        nightLength = float(self.secondsPerHour * self.endHour)
+
+        # The browser drains at its mean rate; doors add to it while closed.
+        baseDrain = FactoryGlobals.BaseEnergyConsumption + FactoryGlobals.BrowserEnergyConsumption * browserDuty
+
+        # Cog arrays are (cog, night) so per-night reductions run over rows.
+        # eventTime is when each cog next wakes, arrives or leaves.
+        phase = np.full((numCogs, count), ASLEEP, dtype=np.int8)
+        point = np.repeat(self.startPoints[:, None], count, 1)
+        target = point.copy()
+
+        eventTime = np.full((numCogs, count), np.inf)
+        hourly = awakeHours >= 1
+        eventTime[hourly] = (awakeHours[hourly] * float(self.secondsPerHour))[:, None]
+        if browserDuty:
+            # The step the browser first shows the watched camera.
+            viewed = rng.geometric(browserDuty / numCameras, (numCogs, count)) * dt
+            eventTime = np.where(byCamera[:, None], np.minimum(eventTime, viewed), eventTime)
+
+        # Cogs at or walking to each door's guard point, and when the
+        # player gets round to closing it.
+        busy = np.zeros((numDoors, count), dtype=np.int64)
+        closed = np.zeros((numDoors, count), dtype=bool)
+        closeTime = np.full((numDoors, count), np.inf)
+        for column in xrange(numDoors):
+            busy[column] = (point == self.doorGuards[column]).sum(0)
+            taken = np.flatnonzero(busy[column])
+            closeTime[column, taken] = self.__getReactionTimes(rng, np.zeros(len(taken)), doorReaction)
+
+        energy = np.full(count, float(self.totalEnergy))
+        now = np.zeros(count)
+
+        outcome = np.full(count, SURVIVED, dtype=np.int8)
+        endTime = np.full(count, nightLength)
+        culprit = np.full(count, -1, dtype=np.int8)
+
+        # Every pass advances each unfinished night to its own next event.
+        nights = np.arange(count)
+        while len(nights):
+            columns = np.arange(len(nights))
+            cogTimes = eventTime[:, nights]
+            cogs = cogTimes.argmin(0)
+            cogNext = cogTimes[cogs, columns]
+            doorTimes = closeTime[:, nights]
+            doors = doorTimes.argmin(0)
+            doorNext = doorTimes[doors, columns]
+
+            drain = baseDrain + FactoryGlobals.DoorEnergyConsumption * closed[:, nights].sum(0)
+            emptyTime = now[nights] + energy[nights] / drain
+            nextTime = np.minimum(np.minimum(cogNext, doorNext), np.minimum(emptyTime, nightLength))
+            energy[nights] -= drain * (nextTime - now[nights])
+            now[nights] = nextTime
+
+            done = nextTime >= nightLength
+            drained = ~done & (emptyTime <= nextTime)
+            outcome[nights[drained]] = OUT_OF_ENERGY
+            endTime[nights[drained]] = emptyTime[drained]
+            done |= drained
+
+            # Doors
+            closing = ~done & (doorNext <= cogNext)
+            closed[doors[closing], nights[closing]] = True
+            closeTime[doors[closing], nights[closing]] = np.inf
+
+            moving = ~done & ~closing
+            cogs, times, movingNights = cogs[moving], nextTime[moving], nights[moving]
+            cogPhase = phase[cogs, movingNights]
+
+            # Wake ups
+            waking = cogPhase == ASLEEP
+            phase[cogs[waking], movingNights[waking]] = WAITING
+            eventTime[cogs[waking], movingNights[waking]] = times[waking] + walkDelays[cogs[waking]]
+
+            # Arrivals
+            arriving = cogPhase == WALKING
+            if arriving.any():
+                c, n = cogs[arriving], movingNights[arriving]
+                point[c, n] = target[c, n]
+
+                caught = point[c, n] == OFFICE_POINT
+                outcome[n[caught]] = CAUGHT
+                endTime[n[caught]] = times[arriving][caught]
+                culprit[n[caught]] = c[caught]
+                done[np.flatnonzero(moving)[arriving][caught]] = True
+
+                c, n = c[~caught], n[~caught]
+                phase[c, n] = WAITING
+                eventTime[c, n] = times[arriving][~caught] + rng.random_sample(len(n)) * NEXT_POINT_DELAY
+
+            # Departures
+            leaving = cogPhase == WAITING
+            if leaving.any():
+                c, n, t = cogs[leaving], movingNights[leaving], times[leaving]
+                here = point[c, n]
+                roll = rng.random_sample(len(n))
+                there = self.neighbours[here, (roll * self.degrees[here]).astype(np.int64)]
+
+                # The first open gated edge always wins, like CogGraph.getNextPoint.
+                doorState = (~closed[:, n] * self.doorBits[:, None]).sum(0)
+                for column in xrange(self.gatedBits.shape[1] - 1, -1, -1):
+                    bits = self.gatedBits[here, column]
+                    isOpen = (bits != 0) & ((doorState & bits) != 0)
+                    there = np.where(isOpen, self.gatedTargets[here, column], there)
+
+                target[c, n] = there
+                phase[c, n] = WALKING
+                eventTime[c, n] = t + self.edgeLengths[here * size + there] / self.speeds[c]
+
+                # A door opens as soon as its guard point is free and starts
+                # closing once it's taken.
+                for column in xrange(numDoors):
+                    guard = self.doorGuards[column]
+                    change = (there == guard).astype(np.int64) - (here == guard)
+                    changed = np.flatnonzero(change)
+                    if not len(changed):
+                        continue
+
+                    doorNights = n[changed]
+                    wasBusy = busy[column, doorNights] > 0
+                    busy[column, doorNights] += change[changed]
+                    isBusy = busy[column, doorNights] > 0
+
+                    freed = doorNights[wasBusy & ~isBusy]
+                    closed[column, freed] = False
+                    closeTime[column, freed] = np.inf
+
+                    taken = ~wasBusy & isBusy
+                    closeTime[column, doorNights[taken]] = self.__getReactionTimes(rng, t[changed][taken], doorReaction)
+
+            nights = nights[~done]
+
+        return NightResults(outcome, endTime, culprit)
+
+    def __getReactionTimes(self, rng, times, doorReaction):
+        # The player gets a doorReaction chance to close the door every step
+        # after it's needed.
+        if doorReaction <= 0:
+            return np.full(len(times), np.inf)
+
+        return (np.floor(times / self.step) + rng.geometric(doorReaction, len(times))) * self.step
+
+    def findUnwinnableNights(self, count=1000, minWinRate=.01, **kw):
+        unwinnable = []
+        for night in sorted(self.behaviours[self.cogTypes[0]]):
+            if self.run(night, count, **kw).getWinRate() < minWinRate:
+                unwinnable.append(night)
+
+        return unwinnable
+
+if __name__ == '__main__':
+    import time
+
+    simulator = NightSimulator()
+    for night in xrange(1, 6):
+        start = time.time()
+        results = simulator.run(night, 10000)
+        elapsed = time.time() - start
+        print('Night %d: won %.1f%%, caught %.1f%%, out of energy %.1f%% (%d nights/s)' % (
+            night, results.getWinRate() * 100, results.getRate(CAUGHT) * 100,
+            results.getRate(OUT_OF_ENERGY) * 100, len(results) / elapsed))
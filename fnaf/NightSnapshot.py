@@ -0,0 +1,19 @@
+# The state a night starts in, taken once the night is entered. Restoring
+# it starts the night over in place: the level, timer and cameras keep
+# their accepts, tasks, music and pooled intervals, nothing is built or
+# loaded again, and the cogs are put back with the TransformStates they
+# started with.
+class NightSnapshot:
+    def __init__(self):
+        level = base.level
+        self.cogTransforms = tuple((cog, cog.getTransform()) for cog in level.cogs)
+        self.doorStates = tuple((door, door.state) for door in level.dynamicDoors)
+        self.occupancy = tuple(level.occupancy)
+        self.energy = base.timer.energy
+        self.hour = base.timer.hour
+        self.cameraIndex = base.camControls.getBrowser().getCameraIndex()
+
+    def restore(self):
+        base.level.restore(self.cogTransforms, self.doorStates, self.occupancy)
+        base.timer.restore(self.energy, self.hour)
+        base.camControls.enter(self.cameraIndex)
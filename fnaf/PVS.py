@@ -0,0 +1,45 @@
+from panda3d.core import BitMask32
+
+from CogVisibility import ALL_VIEWS
+
+try:
+    import PVSTable
+except ImportError:
+    PVSTable = None
+
+# Runtime side of the potentially visible set built by PVSBuilder. Every
+# view (see CogVisibility) owns one camera draw mask bit; level pieces are
+# hidden from the cameras of views that can never see them, so the cull
+# traversal drops them at the top instead of testing their whole subtree.
+# Without a table everything stays visible everywhere.
+
+DrawMaskShift = 8
+
+def getDrawMask(views):
+    return BitMask32(views << DrawMaskShift)
+
+def setCameraView(camNode, view):
+    camNode.setCameraMask(getDrawMask(1 << view))
+
+def hideFromUnseenViews(np, views):
+    hidden = ALL_VIEWS & ~views
+    if hidden:
+        np.hide(getDrawMask(hidden))
+
+def getQuadrantViews(code):
+    if PVSTable is None:
+        return ALL_VIEWS
+
+    return PVSTable.QuadrantViews.get(code, ALL_VIEWS)
+
+def getStaticDoorViews(index):
+    if PVSTable is None or index >= len(PVSTable.StaticDoorViews):
+        return ALL_VIEWS
+
+    return PVSTable.StaticDoorViews[index]
+
+def getDynamicDoorViews(index):
+    if PVSTable is None or index >= len(PVSTable.DynamicDoorViews):
+        return ALL_VIEWS
+
+    return PVSTable.DynamicDoorViews[index]
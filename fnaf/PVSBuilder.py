@@ -0,0 +1,174 @@
+from panda3d.core import *
+
+from FactoryGlobals import LevelQuadrants, StaticDoors, DynamicDoors, CameraNear
+from CogVisibility import getViewFrusta, CameraViewDistance, CogRadius, CogCenterHeight
+from CogGraph import graph
+
+# Offline tool that writes PVSTable.py: for every quadrant, door and
+# waypoint, the views (as CogVisibility view bits) that can actually see
+# it. Views are swept through the same frusta CogVisibility uses. Each
+# frustum shoots a grid of segments into the quadrant geometry and marks
+# whichever quadrant it hits first; doors and waypoints are visible when
+# an unobstructed segment reaches one of their sample points. Doors never
+# block sight, since they may be open.
+#
+# Run it from the game directory whenever the level layout changes:
+#     python fnaf/PVSBuilder.py
+
+GridSize = 64
+TableFile = 'fnaf/PVSTable.py'
+
+class PVSBuilder:
+    def __init__(self, scene):
+        self.scene = scene
+        self.frusta = getViewFrusta()
+
+        self.traverser = CollisionTraverser('PVSBuilder')
+        self.queue = CollisionHandlerQueue()
+        self.rays = CollisionNode('pvs-rays')
+        self.rays.setFromCollideMask(GeomNode.getDefaultCollideMask())
+        self.rays.setIntoCollideMask(BitMask32.allOff())
+        self.traverser.addCollider(scene.attachNewNode(self.rays), self.queue)
+
+    def loadQuadrants(self, modelPrefix):
+        for code, pos, hpr, zScale in LevelQuadrants:
+            quad = loader.loadModel('%sZONE%sa.bam' % (modelPrefix, code))
+            quad.reparentTo(self.scene)
+            quad.setPos(pos)
+            quad.setHpr(hpr)
+            quad.setSz(zScale)
+            quad.setTag('pvsQuadrant', code)
+
+    def getDoorSamples(self, doorModel, kw):
+        # Corners and center of the doorway, as CogDoor builds it.
+        door = self.scene.attachNewNode('door')
+        door.setPos(kw.get('pos', (0, 0, 0)))
+        door.setHpr(kw.get('hpr', (0, 0, 0)))
+        door.setScale(kw.get('scale', 1))
+
+        doorway = doorModel.find('**/Doorway1').copyTo(door)
+        low, high = doorway.getTightBounds(self.scene)
+        samples = [(x, y, z) for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])]
+        samples.append(tuple((low + high) / 2))
+
+        if 'buttonPos' in kw:
+            samples.append(tuple(self.scene.getRelativePoint(door, kw['buttonPos'])))
+
+        door.removeNode()
+        return samples
+
+    def getPointSamples(self, pos):
+        x, y, z = pos[0], pos[1], pos[2] + CogCenterHeight
+        samples = [(x, y, z)]
+        for axis in xrange(3):
+            for sign in (-1, 1):
+                sample = [x, y, z]
+                sample[axis] += sign * CogRadius
+                samples.append(tuple(sample))
+
+        return samples
+
+    @staticmethod
+    def __getKey(solid):
+        return tuple(solid.getPointA()) + tuple(solid.getPointB())
+
+    def __cast(self, segments):
+        # Returns the closest (distance, node) hit of each (start, end)
+        # segment, or None where it reaches its end unobstructed.
+        self.rays.clearSolids()
+        for start, end in segments:
+            self.rays.addSolid(CollisionSegment(Point3(*start), Point3(*end)))
+
+        indices = {}
+        for index in xrange(self.rays.getNumSolids()):
+            indices[self.__getKey(self.rays.getSolid(index))] = index
+
+        self.queue.clearEntries()
+        self.traverser.traverse(self.scene)
+
+        hits = [None] * len(segments)
+        for entry in self.queue.getEntries():
+            index = indices[self.__getKey(entry.getFrom())]
+            start, end = segments[index]
+
+            # Walls are one sided, the renderer culls their backs; the
+            # office camera looks through one.
+            if entry.getSurfaceNormal(self.scene).dot(Point3(*end) - Point3(*start)) >= 0:
+                continue
+
+            point = entry.getSurfacePoint(self.scene)
+            distance = (point - Point3(*start)).length()
+            if hits[index] is None or distance < hits[index][0]:
+                hits[index] = (distance, entry.getIntoNodePath())
+
+        return hits
+
+    def getQuadrantViews(self):
+        views = {}
+        for view, frusta in enumerate(self.frusta):
+            for frustum in frusta:
+                segments = []
+                for i in xrange(GridSize):
+                    for j in xrange(GridSize):
+                        u = (2.0 * (i + .5) / GridSize - 1) * frustum.tan
+                        v = (2.0 * (j + .5) / GridSize - 1) * frustum.tan
+                        direction = [frustum.forward[k] + u * frustum.right[k] + v * frustum.up[k] for k in xrange(3)]
+                        start = [frustum.eye[k] + direction[k] * CameraNear for k in xrange(3)]
+                        end = [frustum.eye[k] + direction[k] * CameraViewDistance for k in xrange(3)]
+                        segments.append((start, end))
+
+                for hit in self.__cast(segments):
+                    if hit is not None:
+                        code = hit[1].getNetTag('pvsQuadrant')
+                        views[code] = views.get(code, 0) | (1 << view)
+
+        return dict((code, views.get(code, 0)) for code, pos, hpr, zScale in LevelQuadrants)
+
+    def getSampleViews(self, samples):
+        # Views with a clear line of sight to any of the sample points.
+        mask = 0
+        for view, frusta in enumerate(self.frusta):
+            # Every frustum of a view shares its eye, so one segment per
+            # sample that any of them contains.
+            segments = []
+            for sample in samples:
+                if any(frustum.containsSphere(sample, 0) for frustum in frusta):
+                    segments.append((frusta[0].eye, sample))
+
+            for (start, end), hit in zip(segments, self.__cast(segments)):
+                length = (Point3(*end) - Point3(*start)).length()
+                if hit is None or hit[0] >= length - .01:
+                    mask |= 1 << view
+                    break
+
+        return mask
+
+    def build(self, modelPrefix, doorModelFile):
+        self.loadQuadrants(modelPrefix)
+        doorModel = loader.loadModel(doorModelFile)
+
+        table = {}
+        table['QuadrantViews'] = self.getQuadrantViews()
+        table['StaticDoorViews'] = tuple(self.getSampleViews(self.getDoorSamples(doorModel, kw)) for kw in StaticDoors)
+        table['DynamicDoorViews'] = tuple(self.getSampleViews(self.getDoorSamples(doorModel, kw)) for kw in DynamicDoors)
+        table['PointViews'] = tuple(self.getSampleViews(self.getPointSamples(pos)) if pos is not None else 0
+                                    for pos in graph.positions)
+        return table
+
+def writeTable(table, filename):
+    with open(filename, 'w') as f:
+        f.write('# Generated by PVSBuilder.py, do not edit.\n')
+        f.write('# View bits as in CogVisibility: CameraPoints indices, then the office.\n\n')
+        for name in ('QuadrantViews', 'StaticDoorViews', 'DynamicDoorViews', 'PointViews'):
+            f.write('%s = %r\n' % (name, table[name]))
+
+if __name__ == '__main__':
+    loadPrcFileData('', 'window-type none\naudio-library-name null')
+    from direct.showbase.ShowBase import ShowBase
+    ShowBase()
+    getModelPath().prependDirectory(ExecutionEnvironment.getCwd())
+
+    builder = PVSBuilder(NodePath('pvs'))
+    table = builder.build('data/', 'data/door.bam')
+    writeTable(table, TableFile)
+    print('Wrote %s' % TableFile)
@@ -0,0 +1,7 @@
+# Generated by PVSBuilder.py, do not edit.
+# View bits as in CogVisibility: CameraPoints indices, then the office.
+
+QuadrantViews = {'15': 34, '17': 49, '08': 34, '04': 14, '03': 16}
+StaticDoorViews = (6, 12)
+DynamicDoorViews = (32, 34)
+PointViews = (0, 32, 34, 34, 2, 2, 2, 2, 34, 34, 34, 2, 2, 2, 12, 14, 33, 33, 16, 1)
@@ -0,0 +1,57 @@
+from panda3d.core import *
+
+from FrameStats import getSection
+
+PickMask = BitMask32(8)
+
+# The clickable objects, as spheres under a collision root of their own,
+# so a click only tests the picker ray against them instead of walking
+# the whole scene. Each object hit sends 'click-<name>' once.
+class PickIndex:
+    def __init__(self):
+        # The traverser needs the ray and the spheres in one scene graph,
+        # hiding the root keeps it out of the cull traversal.
+        self.root = render.attachNewNode('pickIndex')
+        self.root.hide()
+        self.targets = {}
+
+        self.ray = CollisionRay()
+        cNode = CollisionNode('mousePicker')
+        cNode.addSolid(self.ray)
+        cNode.setFromCollideMask(PickMask)
+        cNode.setIntoCollideMask(BitMask32.allOff())
+        self.picker = base.cam.attachNewNode(cNode)
+
+        self.queue = CollisionHandlerQueue()
+        self.traverser = CollisionTraverser('pickIndex')
+        self.traverser.addCollider(self.picker, self.queue)
+
+    def add(self, name, nodePath, radius):
+        # The sphere is placed where nodePath is now; clickables don't move.
+        cNode = CollisionNode(name)
+        cNode.addSolid(CollisionSphere(0, 0, 0, radius))
+        cNode.setIntoCollideMask(PickMask)
+        target = self.root.attachNewNode(cNode)
+        target.setTransform(nodePath.getTransform(self.root))
+        self.targets[name] = target
+
+    def remove(self, name):
+        target = self.targets.pop(name, None)
+        if target is not None:
+            target.removeNode()
+
+    def pick(self, x, y):
+        section = getSection('picking')
+        section.start()
+        self.ray.setFromLens(base.camNode, x, y)
+        self.traverser.traverse(self.root)
+
+        self.queue.sortEntries()
+        picked = set()
+        for i in xrange(self.queue.getNumEntries()):
+            name = self.queue.getEntry(i).getIntoNode().getName()
+            if name not in picked:
+                picked.add(name)
+                messenger.send('click-%s' % name)
+
+        section.stop()
@@ -0,0 +1,70 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+# Game logic time, kept apart from rendering. Every frame the real frame
+# time (times timeScale) is banked and spent in fixed steps; listeners
+# (the AI and Timer schedulers) run once per step. Since logic only ever
+# sees whole steps, a night plays out the same at any time scale.
+class SimClock:
+    notify = directNotify.newCategory('SimClock')
+    taskName = 'SimClock-task'
+
+    def __init__(self, step=1.0 / 60, timeScale=1.0, maxFrameTime=.25):
+        self.step = step
+        self.timeScale = timeScale
+        self.maxFrameTime = maxFrameTime
+
+        self.stepCount = 0
+        self.time = 0.0
+        self.accumulator = 0.0
+        self.listeners = ()
+        self.paused = False
+
+    def start(self):
+        taskMgr.add(self.__update, self.taskName, sort=-10)
+
+    def stop(self):
+        taskMgr.remove(self.taskName)
+
+    def pause(self):
+        # Logic stands still (and banks no time) until resume.
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def getTime(self):
+        return self.time
+
+    def setTimeScale(self, timeScale):
+        self.notify.info('time scale %sx' % timeScale)
+        self.timeScale = timeScale
+
+    def addListener(self, listener):
+        if listener not in self.listeners:
+            self.listeners += (listener,)
+
+    def removeListener(self, listener):
+        self.listeners = tuple(x for x in self.listeners if x != listener)
+
+    def __update(self, task):
+        if self.paused:
+            return task.cont
+
+        # Cap the banked time so a stall doesn't make logic jump ahead.
+        self.accumulator += min(globalClock.getDt(), self.maxFrameTime) * self.timeScale
+        while self.accumulator >= self.step and not self.paused:
+            self.accumulator -= self.step
+            self.__step()
+
+        return task.cont
+
+    def __step(self):
+        self.stepCount += 1
+        self.time = self.stepCount * self.step
+        # A listener may pause the clock (the night ended), the rest of the
+        # step is then dropped too.
+        for listener in self.listeners:
+            if self.paused:
+                break
+
+            listener()
@@ -0,0 +1,38 @@
+import time
+startTime = time.time()
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+# Milliseconds from process start-up (this module's import, which main.py
+# does first) to each named startup phase. FNAFBase reports the timeline
+# once the menu is drawn and the level assets are in, and warns when the
+# menu took longer than menuBudget.
+class StartupTimeline:
+    notify = directNotify.newCategory('StartupTimeline')
+    menuBudget = 500
+
+    def __init__(self):
+        self.startTime = startTime
+        self.marks = []
+
+    def mark(self, phase):
+        self.marks.append((phase, (time.time() - self.startTime) * 1000))
+
+    def getTime(self, phase):
+        for name, ms in self.marks:
+            if name == phase:
+                return ms
+
+        return None
+
+    def report(self):
+        last = 0
+        for phase, ms in self.marks:
+            self.notify.info('%8.1f ms  +%6.1f  %s' % (ms, ms - last, phase))
+            last = ms
+
+        menuTime = self.getTime('menu drawn')
+        if menuTime is not None and menuTime > self.menuBudget:
+            self.notify.warning('time to menu %.0f ms, over the %d ms budget' % (menuTime, self.menuBudget))
+
+timeline = StartupTimeline()
@@ -0,0 +1,101 @@
+from panda3d.core import *
+import glob, sys
+
+# Offline texture pipeline. Every model in data/ is loaded, which merges
+# each .jpg with its _a.rgb alpha file; every texture is then written as a
+# .txo holding the merged image and its whole mipmap chain, optionally DXT
+# compressed. The models are written out again next to them under build/,
+# pointing at the .txo files, along with .txo versions of the loose 2D
+# textures. The prc files put build/ ahead of the game directory on the
+# model path, so the game picks up the processed models through the same
+# relative paths.
+#
+# Run it from the game directory whenever data/ changes:
+#     python fnaf/TextureBuilder.py [--compress]
+
+BuildDir = 'build'
+ModelFiles = 'data/*.bam'
+SkippedFiles = ('data/level.bam',)
+TextureFiles = ('data/fnafmap.png',)
+
+def locateTexture(path):
+    # The built .txo of a loose texture if there is one, else path itself.
+    txo = Filename(path)
+    txo.setExtension('txo')
+    if VirtualFileSystem.getGlobalPtr().resolveFilename(txo, getModelPath().getValue()):
+        return txo
+
+    return path
+
+class TextureBuilder:
+    def __init__(self, compress=False):
+        self.compress = compress
+        self.built = {}
+        self.sourceBytes = 0
+        self.builtBytes = 0
+
+    def getOutputFile(self, path):
+        return Filename('%s/%s' % (BuildDir, Filename(path).getFullpath()))
+
+    def buildTexture(self, texture, outputDir):
+        # Textures are shared between models (and by the TexturePool), each
+        # is only built once.
+        if texture.getFullpath() in self.built.values():
+            return
+
+        key = (texture.getFullpath().getFullpath(), texture.getAlphaFullpath().getFullpath())
+        txo = self.built.get(key)
+        if txo is None:
+            txo = Filename(outputDir, texture.getFilename().getBasenameWoExtension() + '.txo')
+            self.sourceBytes += texture.getRamImageSize()
+
+            texture.setMinfilter(SamplerState.FTLinearMipmapLinear)
+            texture.generateRamMipmapImages()
+            if self.compress:
+                if not texture.compressRamImage(Texture.CMOn, Texture.QLBest, None):
+                    print('%s: could not be compressed, left as is' % texture.getName())
+
+            self.builtBytes += sum(texture.getRamMipmapImageSize(n) for n in xrange(texture.getNumRamMipmapImages()))
+
+            txo.makeDir()
+            texture.write(txo)
+            self.built[key] = txo
+
+        texture.setFilename(txo)
+        texture.setFullpath(txo)
+        texture.clearAlphaFilename()
+        texture.clearAlphaFullpath()
+
+    def buildModel(self, path):
+        model = loader.loadModel(path, noCache=True)
+        textures = model.findAllTextures()
+        if not textures.getNumTextures():
+            return False
+
+        output = self.getOutputFile(path)
+        for texture in textures:
+            self.buildTexture(texture, output.getDirname())
+
+        output.makeDir()
+        return model.writeBamFile(output)
+
+    def build(self):
+        for path in sorted(glob.glob(ModelFiles)):
+            if path not in SkippedFiles and self.buildModel(path):
+                print('%s -> %s' % (path, self.getOutputFile(path)))
+
+        for path in TextureFiles:
+            texture = loader.loadTexture(path)
+            self.buildTexture(texture, self.getOutputFile(path).getDirname())
+            print('%s -> %s' % (path, texture.getFilename()))
+
+        print('%d textures, %dK decoded, %dK as .txo with mipmaps' % (
+              len(self.built), self.sourceBytes / 1024, self.builtBytes / 1024))
+
+if __name__ == '__main__':
+    loadPrcFileData('', 'window-type none\naudio-library-name null\nbam-texture-mode relative')
+    from direct.showbase.ShowBase import ShowBase
+    ShowBase()
+    getModelPath().prependDirectory(ExecutionEnvironment.getCwd())
+
+    TextureBuilder(compress='--compress' in sys.argv).build()
@@ -1,110 +1,183 @@
 from direct.gui.DirectGui import *
 from panda3d.core import *
 
-class EnergyBar(DirectFrame):
+import FactoryGlobals
+from AIScheduler import AIScheduler, ScheduledEvent
+from HUD import StaticBatch
+from FrameStats import getSection
+
+class EnergyBar(NodePath):
+    width = .425
+    
     def __init__(self, parent):
-        _pos = (.5, 0, .075)
-        
-        DirectFrame.__init__(self, pos=_pos, frameColor=(0, 0, 0, 1),
-                             frameSize=(-.3, .125, 0, .075), parent=parent)
-        self.initialiseoptions(EnergyBar)
-        
-        self.overlappingFrame = DirectFrame(pos=_pos, frameColor=(1, 0, 0, 1),
-                                            frameSize=(-.3, .125, 0, .075), parent=parent)
+        NodePath.__init__(self, 'EnergyBar')
+        self.reparentTo(parent)
+        self.setPos(.2, 0, .075)
+        self.pixels = None
+        
+        # The background is static; the fill is a card scaled to the
+        # energy left, its geometry is never rebuilt.
+        background = StaticBatch('EnergyBar-background', self)
+        background.addCard((0, self.width, 0, .075), (0, 0, 0, 1))
+        background.flatten()
+        
+        cm = CardMaker('EnergyBar-fill')
+        cm.setFrame(0, self.width, 0, .075)
+        cm.setColor(1, 0, 0, 1)
+        self.fill = self.attachNewNode(cm.generate())
                                             
-        self.text = OnscreenText(text="Energy", fg=(1, 1, 1, 1), parent=self.overlappingFrame,
-                                 font=base.cogFont, scale=.035, pos=(-.085, .025))
+        self.text = OnscreenText(text="Energy", fg=(1, 1, 1, 1), parent=self,
+                                 font=base.cogFont, scale=.035, pos=(.215, .025))
                      
         self.hide()
         
     def setValue(self, value):
-        x = -.3 + .425 * value
-        self.overlappingFrame['frameSize'] = (-.3, x, 0, .075)
-        
-    def hide(self):
-        self.overlappingFrame.hide()
-        DirectFrame.hide(self)
+        # Only touch the fill when its visible width changes by a pixel.
+        width = self.getPixelWidth()
+        pixels = max(0, min(width, int(value * width)))
+        if pixels == self.pixels:
+            return
+            
+        self.pixels = pixels
+        if not pixels:
+            # A zero scale would make the transform singular.
+            self.fill.hide()
+            return
+            
+        self.fill.show()
+        self.fill.setSx(pixels / float(width))
         
-    def show(self):
-        self.overlappingFrame.show()
-        DirectFrame.show(self)
+    def getPixelWidth(self):
+        # The bar spans .425 units in aspect2d, which spans the window height.
+        if not base.win:
+            return 1000
+            
+        return max(1, int(self.width * base.win.getYSize() / 2.0))
 
 class Timer:
-    secondsPerHour = 60
-    endHour = 6
-    totalEnergy = int(secondsPerHour * endHour * 2.2)
+    secondsPerHour = FactoryGlobals.SecondsPerHour
+    endHour = FactoryGlobals.EndHour
+    totalEnergy = FactoryGlobals.TotalEnergy
     
     def __init__(self):        
         self.infoText = OnscreenText(text="12 AM\nNight 1", align=TextNode.ARight, pos=(-.1, -.1),
                                      parent=base.a2dTopRight, fg=(1, 1, 1, 1), font=base.cogFont)
-        self.energyBar = EnergyBar(base.a2dBottomLeft)
+        self.energyBar = None
         
         self.infoText.hide()
         
+        self.scheduler = AIScheduler(base.simClock, getSection('timer'))
+        self.hourEvent = ScheduledEvent(self, Timer.nextHour)
+        self.outOfEnergyEvent = ScheduledEvent(self, Timer.ranOutOfEnergy)
+        self.redrawEvent = ScheduledEvent(self, Timer.redrawEnergy)
+        
     def enter(self, night=1):
+        # The bar is built for the first night, the menu doesn't need it.
+        if self.energyBar is None:
+            self.energyBar = EnergyBar(base.a2dBottomLeft)
+            
         self.infoText.show()
         self.energyBar.show()
+        self.scheduler.start()
         
+        # Energy drains linearly between consumption changes: it was
+        # self.energy at self.energyTime and drops by self.consume per second.
         self.energy = Timer.totalEnergy
+        self.energyTime = base.simClock.getTime()
         self.consume = 0
         self.hour = 0
         self.consumptionTable = {}
+        self.draining = True
         
-        self.addEnergyConsumption('base', 1)
+        self.addEnergyConsumption('base', FactoryGlobals.BaseEnergyConsumption)
         
-        taskMgr.add(self.energyTask, 'Timer-energyTask')
-        taskMgr.doMethodLater(self.secondsPerHour, self.nextHour, 'Timer-nextHour')
+        self.scheduler.schedule(self.hourEvent, self.secondsPerHour)
         
         self.night = night
-        self.infoText['text'] = "12 AM\nNight %d" % self.night
+        self.updateInfoText()
+        
+    def restore(self, energy, hour):
+        # Back to the start of the night, see NightSnapshot. The consumers
+        # are left alone, whatever still draws energy keeps drawing it.
+        self.scheduler.cancel(self.hourEvent)
+        self.energy = energy
+        self.energyTime = base.simClock.getTime()
+        self.hour = hour
+        self.draining = True
+        self.__scheduleEnergyEvents()
+        
+        self.scheduler.schedule(self.hourEvent, self.secondsPerHour)
+        self.updateInfoText()
+        
+    def updateInfoText(self):
+        self.infoText['text'] = "%d AM\nNight %d" % (self.hour or 12, self.night)
         
     def exit(self):
         self.infoText.hide()
         self.energyBar.hide()
-        taskMgr.remove('Timer-energyTask')
-        taskMgr.remove('Timer-nextHour')
-       
-    def energyTask(self, task):
-        self.energy -= self.consume * min(1, globalClock.getDt())
-        if self.energy <= 0:
-            messenger.send("ranOutOfEnergy")
-            return task.done
-            
-        self.energyBar.setValue(self.energy / Timer.totalEnergy)
+        self.draining = False
+        self.scheduler.stop()
         
-        if __debug__ and 0:
-            text = "%d AM\nNight %d" % (0 if self.hour == 12 else self.hour, self.night)
-            _minute = (task.time % self.secondsPerHour) / (self.secondsPerHour / 60.0)
-            text += "\n\n%d:%d" % (0 if self.hour == 12 else self.hour, _minute)
-            self.infoText['text'] = text
+    def getEnergy(self):
+        return self.energy - self.consume * (base.simClock.getTime() - self.energyTime)
         
-        return task.cont
+    def __settleEnergy(self):
+        now = base.simClock.getTime()
+        self.energy -= self.consume * (now - self.energyTime)
+        self.energyTime = now
         
-    def nextHour(self, task):
+    def __scheduleEnergyEvents(self):
+        self.scheduler.cancel(self.outOfEnergyEvent)
+        self.scheduler.cancel(self.redrawEvent)
+        if not self.draining:
+            return
+            
+        self.redrawEnergy()
+        if self.consume > 0:
+            self.scheduler.schedule(self.outOfEnergyEvent, max(0, self.energy / self.consume))
+        
+    def ranOutOfEnergy(self):
+        self.__settleEnergy()
+        self.energy = 0
+        self.draining = False
+        self.scheduler.cancel(self.redrawEvent)
+        self.energyBar.setValue(0)
+        messenger.send("ranOutOfEnergy")
+        
+    def redrawEnergy(self):
+        energy = self.getEnergy()
+        self.energyBar.setValue(energy / Timer.totalEnergy)
+        
+        if self.consume > 0 and energy > 0:
+            # Sleep until the bar loses its next pixel.
+            energyPerPixel = Timer.totalEnergy / float(self.energyBar.getPixelWidth())
+            delay = (energy % energyPerPixel or energyPerPixel) / self.consume
+            self.scheduler.schedule(self.redrawEvent, delay)
+            
+    def nextHour(self):
         self.hour += 1
         if self.hour == self.endHour:
             messenger.send("dayComplete")
-            return task.done
+            return
             
         messenger.send("enterHour", [self.hour])
+        self.updateInfoText()
         
-        text = "%d AM\nNight %d" % (self.hour, self.night) 
-        self.infoText['text'] = text
-        
-        return task.again
+        self.scheduler.schedule(self.hourEvent, self.secondsPerHour)
         
     def addEnergyConsumption(self, hash, consumption):
+        self.__settleEnergy()
         if hash in self.consumptionTable:
-            self.removeEnergyConsumption(hash)
+            self.consume -= self.consumptionTable.pop(hash)
             
         self.consumptionTable[hash] = consumption
         self.consume += consumption
+        self.__scheduleEnergyEvents()
         
     def removeEnergyConsumption(self, hash):
         if hash not in self.consumptionTable:
             return
             
-        consumption = self.consumptionTable[hash]
-        self.consume -= consumption
-        del self.consumptionTable[hash]
-        
\ No newline at end of file
+        self.__settleEnergy()
+        self.consume -= self.consumptionTable.pop(hash)
+        self.__scheduleEnergyEvents()
@@ -0,0 +1,61 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import *
+
+from CogVisibility import OFFICE_VIEW
+from FactoryGlobals import CameraPoints, CameraFov, CameraNear, CameraOffset, FogFarDistance
+from FactoryGlobals import OfficeCameraPos, OfficeLookRange
+import PVS
+
+# Gets the level onto the GPU before the night starts, so the first look
+# through each camera costs what every later one does. Everything under
+# the level is prepared, then one frame is rendered into a small
+# offscreen buffer from each CCTV camera and from the office facing
+# ahead and at both ends of its look range, each with that view's PVS
+# draw mask, which settles the render states those views use.
+
+notify = directNotify.newCategory('WarmUp')
+
+BufferSize = 64
+
+def getPoses():
+    # (view, parent pos, parent hpr, camera pos, camera heading) for each pose.
+    cctvPos = tuple(a + b for a, b in zip(OfficeCameraPos, CameraOffset))
+    poses = [(index, pos, hpr, cctvPos, 0) for index, (pos, hpr, name) in enumerate(CameraPoints)]
+    for h in (0, -OfficeLookRange, OfficeLookRange):
+        poses.append((OFFICE_VIEW, (0, 0, 0), (0, 0, 0), OfficeCameraPos, h))
+
+    return poses
+
+def warmUp(scene):
+    start = globalClock.getRealTime()
+    scene.prepareScene(base.win.getGsg())
+
+    buffer = base.win.makeTextureBuffer('warmUp', BufferSize, BufferSize)
+    if not buffer:
+        # The prepared textures and geoms still go up with the next frame.
+        notify.info('no offscreen buffer, prepared the level without rendering it')
+        return
+
+    lens = PerspectiveLens()
+    lens.setFov(CameraFov)
+    lens.setNear(CameraNear)
+    lens.setFar(FogFarDistance)
+
+    pivot = NodePath('warmUp')
+    camNP = base.makeCamera(buffer, lens=lens, camName='warmUp-cam')
+    camNP.reparentTo(pivot)
+    camNP.node().setScene(scene)
+
+    poses = getPoses()
+    for view, pos, hpr, camPos, h in poses:
+        pivot.setPosHpr(pos, hpr)
+        camNP.setPos(camPos)
+        camNP.setH(h)
+        camNP.node().setCameraMask(PVS.getDrawMask(1 << view))
+        base.graphicsEngine.renderFrame()
+
+    base.graphicsEngine.removeWindow(buffer)
+    base.camList.remove(camNP)
+    pivot.removeNode()
+
+    notify.info('%d views warmed up in %.0f ms' % (len(poses), (globalClock.getRealTime() - start) * 1000))
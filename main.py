@@ -1,6 +1,8 @@
+from fnaf.StartupTimeline import timeline
 from direct.showbase.ShowBase import ShowBase
 from fnaf.FNAFBase import FNAFBase
 from panda3d.core import loadPrcFile
+timeline.mark('imports')
 
 if __debug__:
     loadPrcFile('config/dev.prc')
@@ -10,6 +12,7 @@ else:
 class GameBase(FNAFBase, ShowBase):
     def __init__(self):
         ShowBase.__init__(self)
+        timeline.mark('window open')
         FNAFBase.__init__(self)
         self.disableMouse()
 
@@ -20,8 +23,7 @@ class GameBase(FNAFBase, ShowBase):
 GameBase()
 
 if config.GetBool('want-speed-hack', False):
-    from fnaf import Timer
-    Timer.Timer.secondsPerHour = 6
+    base.simClock.setTimeScale(10)
 
 base.startGame()
 run()
@@ -0,0 +1,85 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fnaf'))
+
+from panda3d.core import loadPrcFileData
+loadPrcFileData('test_CameraFeeds', '''
+window-type offscreen
+audio-library-name null
+fnaf-cctv-size 16
+fnaf-cctv-idle-rate 20
+''')
+
+from direct.showbase.ShowBase import ShowBase
+from panda3d.core import NodePath
+
+from CameraFeeds import CameraFeeds
+
+NumFeeds = 3
+
+class StillLevel:
+    # No cog walks through any view, so every feed refreshes at the idle rate.
+    def getMovingViews(self):
+        return 0
+
+class TestCameraFeeds(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ShowBase()
+        base.level = StillLevel()
+
+    @classmethod
+    def tearDownClass(cls):
+        del base.level
+        base.destroy()
+
+    def setUp(self):
+        self.feeds = CameraFeeds()
+        self.parents = [render.attachNewNode('camera-%d' % i) for i in xrange(NumFeeds)]
+        if not self.feeds.load(self.parents):
+            self.skipTest('no offscreen buffers')
+
+        self.camCount = len(base.camList)
+
+    def tearDown(self):
+        self.feeds.unload()
+        for parent in self.parents:
+            parent.removeNode()
+
+    def getActiveFrames(self, seconds):
+        # Frames each feed's buffer was switched on for when the frame rendered.
+        activeFrames = [0] * NumFeeds
+        def record(task):
+            for feed in self.feeds.feeds:
+                activeFrames[feed.index] += feed.buffer.isActive()
+
+            return task.cont
+
+        # Between the feeds' task and igLoop.
+        taskMgr.add(record, 'test-record', sort=40)
+        end = globalClock.getRealTime() + seconds
+        while globalClock.getRealTime() < end:
+            taskMgr.step()
+
+        taskMgr.remove('test-record')
+        return activeFrames
+
+    def testIdleFeedsRefresh(self):
+        self.feeds.select(0)
+        self.feeds.start()
+
+        # Let the one-shots from start() render and switch off first.
+        taskMgr.step()
+        taskMgr.step()
+        activeFrames = self.getActiveFrames(self.feeds.idleInterval * 3)
+
+        self.assertTrue(activeFrames[0] > 0)
+        for index in xrange(1, NumFeeds):
+            self.assertTrue(activeFrames[index] > 0, 'feed %d never refreshed' % index)
+
+    def testUnloadRemovesCameras(self):
+        self.feeds.unload()
+        self.assertEqual(len(base.camList), self.camCount - NumFeeds)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fnaf'))
+
+from NightSimulator import NightSimulator, CAUGHT
+
+Seed = 1
+
+class TestNightSimulator(unittest.TestCase):
+    def testStockNightsAreWinnable(self):
+        self.assertEqual(NightSimulator().findUnwinnableNights(seed=Seed), [])
+
+    def testImmediateWakeUpWithoutDoorsIsUnwinnable(self):
+        # Every cog up at the first hour and straight on its way, and a
+        # player who never closes a door.
+        behaviours = dict((type, {1: {'awake': 1, 'walkDelay': 0}}) for type in 'ABC')
+        simulator = NightSimulator(behaviours=behaviours)
+        self.assertEqual(simulator.findUnwinnableNights(seed=Seed, doorReaction=0), [1])
+
+        results = simulator.run(1, 1000, doorReaction=0, seed=Seed)
+        self.assertEqual(results.getRate(CAUGHT), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()